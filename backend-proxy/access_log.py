@@ -0,0 +1,205 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics import current_timing
+
+access_logger = logging.getLogger("access")
+
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed via ``extra=`` end up as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class RepeatFilter(logging.Filter):
+    """Lets at most ``burst`` identical messages per logger and level through each ``window`` seconds.
+
+    Messages are grouped by their template and first argument, which by
+    convention names the service, so one service's outage cannot silence
+    another's errors while per-path details still collapse together. The
+    first message after a quiet window carries the number of copies that
+    were dropped.
+    """
+
+    def __init__(self, window: float = 10.0, burst: int = 5, max_keys: int = 1024):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.max_keys = max_keys
+        self.seen: "OrderedDict[Tuple[str, int, str, str], List[float]]" = OrderedDict()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.name == access_logger.name:
+            return True
+        subject = str(record.args[0])[:200] if isinstance(record.args, tuple) and record.args else ""
+        key = (record.name, record.levelno, str(record.msg), subject)
+        now = time.monotonic()
+        state = self.seen.get(key)
+        if state is None or now - state[0] >= self.window:
+            dropped = int(state[2]) if state is not None else 0
+            self.seen[key] = [now, 1, 0]
+            self.seen.move_to_end(key)
+            while len(self.seen) > self.max_keys:
+                self.seen.popitem(last=False)
+            if dropped:
+                record.suppressed = dropped
+            return True
+        if state[1] < self.burst:
+            state[1] += 1
+            return True
+        state[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueues records without formatting them; drops (and counts) records when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so formatting can wait for its thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self, handler: DroppingQueueHandler, listener: QueueListener, repeat_filter: RepeatFilter):
+        self.handler = handler
+        self.listener = listener
+        self.repeat_filter = repeat_filter
+
+    def stop(self):
+        self.listener.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "suppressed": self.repeat_filter.suppressed,
+        }
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    queue_size: int = 10000,
+    repeat_window: float = 10.0,
+    repeat_burst: int = 5,
+    path: Optional[str] = None,
+) -> LogPipeline:
+    """Route all logging through a bounded queue drained by a background thread."""
+    output: logging.Handler = logging.FileHandler(path) if path else logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    repeat_filter = RepeatFilter(repeat_window, repeat_burst)
+    handler.addFilter(repeat_filter)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    # Drain whatever is still queued when the process exits.
+    atexit.register(listener.stop)
+    return LogPipeline(handler, listener, repeat_filter)
+
+
+class AccessLogMiddleware:
+    """Pure ASGI middleware writing one structured record per sampled request.
+
+    Errors (5xx) use their own sample rate so outages stay visible while the
+    success path can be sampled down.
+    """
+
+    def __init__(self, app, services: Iterable[str], sample_rate: float = 1.0, error_sample_rate: float = 1.0, enabled: bool = True):
+        self.app = app
+        self.services = set(services)
+        self.sample_rate = sample_rate
+        self.error_sample_rate = error_sample_rate
+        self.enabled = enabled
+
+    def _service(self, path: str) -> str:
+        if path.startswith("/api/"):
+            service_name = path[5:].split("/", 1)[0]
+            if service_name in self.services:
+                return service_name
+        return "proxy"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        response_headers: Dict[str, str] = {}
+        sent_bytes = 0
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, sent_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", ()):
+                    name = name.decode("latin-1").lower()
+                    if name in ("x-cache", "x-fallback"):
+                        response_headers[name] = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            rate = self.error_sample_rate if status_code >= 500 else self.sample_rate
+            if rate >= 1.0 or random.random() < rate:
+                timing = current_timing.get()
+                upstream = timing.phases.get("upstream") if timing is not None else None
+                access_logger.info(
+                    "request",
+                    extra={
+                        "service": self._service(scope["path"]),
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                        "upstream_ms": round(upstream * 1000, 2) if upstream is not None else None,
+                        "cache": response_headers.get("x-cache"),
+                        "fallback": response_headers.get("x-fallback"),
+                        "bytes": sent_bytes,
+                        "sample_rate": rate,
+                    },
+                )
@@ -0,0 +1,292 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics import ADMISSION_REJECTED, timed_phase
+from settings import service_env
+from streaming import wants_event_stream
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+def parse_priority_rules(spec: str) -> Dict[str, str]:
+    """Parse "analytics/exports=low,sis/students=high" into {"analytics/exports": "low", ...}."""
+    rules = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        prefix, priority = item.split("=", 1)
+        priority = priority.strip().lower()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class '{priority}' for {prefix.strip()}")
+        rules[prefix.strip().strip("/")] = priority
+    return rules
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> float:
+        """Take one token; returns 0 on success, else the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent requests; excess requests wait in a short priority queue or are shed."""
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float, low_priority_queue_share: float = 0.5):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.low_priority_queue_size = int(queue_size * low_priority_queue_share)
+        self.active = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.queued = 0
+        self.sequence = itertools.count()
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and self.queued == 0
+
+    async def acquire(self, priority: int, status_code: int, reason: str, retry_after: float):
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return
+        max_queue = self.low_priority_queue_size if priority >= PRIORITIES["low"] else self.queue_size
+        if self.queued >= max_queue:
+            raise Rejected(status_code, f"{reason} queue full", retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), waiter))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise Rejected(status_code, f"{reason} queue timeout", retry_after)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up; pass it on.
+            self.release()
+        else:
+            waiter.cancel()
+            self.queued -= 1
+
+    def release(self):
+        self.active -= 1
+        while self.waiters:
+            _, _, waiter = heapq.heappop(self.waiters)
+            if waiter.done():
+                continue
+            self.queued -= 1
+            self.active += 1
+            waiter.set_result(None)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "active": self.active, "queued": self.queued, "queue_size": self.queue_size}
+
+
+class AdmissionController:
+    """Per-tenant and per-service rate limits and concurrency caps, checked before a request is proxied."""
+
+    def __init__(
+        self,
+        services: Iterable[str],
+        tenant_header: str = "x-tenant-id",
+        tenant_rate: float = 0.0,
+        tenant_burst: float = 0.0,
+        tenant_concurrency: int = 0,
+        tenant_overrides: Optional[Dict[str, float]] = None,
+        priority_rules: Optional[Dict[str, str]] = None,
+        queue_size: int = 50,
+        queue_timeout: float = 0.5,
+        low_priority_queue_share: float = 0.5,
+        shed_retry_after: float = 1.0,
+        max_tenants: int = 10000,
+    ):
+        self.services = set(services)
+        self.tenant_header = tenant_header.lower()
+        self.tenant_rate = tenant_rate
+        self.tenant_burst = tenant_burst or tenant_rate
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_overrides = tenant_overrides or {}
+        self.priority_rules = priority_rules or {}
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.low_priority_queue_share = low_priority_queue_share
+        self.shed_retry_after = shed_retry_after
+        self.max_tenants = max_tenants
+        self.service_buckets: Dict[str, TokenBucket] = {}
+        self.service_limiters: Dict[str, ConcurrencyLimiter] = {}
+        for name in self.services:
+            rate = float(service_env(name, "RATE_LIMIT", "SERVICE_RATE_LIMIT", "0"))
+            if rate > 0:
+                burst = float(service_env(name, "RATE_BURST", "SERVICE_RATE_BURST", str(rate)))
+                self.service_buckets[name] = TokenBucket(rate, burst)
+            limit = int(service_env(name, "MAX_CONCURRENCY", "SERVICE_MAX_CONCURRENCY", "0"))
+            if limit > 0:
+                self.service_limiters[name] = ConcurrencyLimiter(limit, queue_size, queue_timeout, low_priority_queue_share)
+        self.tenant_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.tenant_limiters: Dict[str, ConcurrencyLimiter] = {}
+
+    def priority_for(self, service_name: str, path: str) -> int:
+        route = f"{service_name}/{path.strip('/')}"
+        best, best_len = "normal", -1
+        for prefix, priority in self.priority_rules.items():
+            if (route == prefix or route.startswith(prefix + "/")) and len(prefix) > best_len:
+                best, best_len = priority, len(prefix)
+        return PRIORITIES[best]
+
+    def _tenant_bucket(self, tenant: str) -> Optional[TokenBucket]:
+        rate = self.tenant_overrides.get(tenant, self.tenant_rate)
+        if rate <= 0:
+            return None
+        bucket = self.tenant_buckets.get(tenant)
+        if bucket is None:
+            bucket = self.tenant_buckets[tenant] = TokenBucket(rate, max(self.tenant_burst, rate))
+            if len(self.tenant_buckets) > self.max_tenants:
+                self.tenant_buckets.popitem(last=False)
+        else:
+            self.tenant_buckets.move_to_end(tenant)
+        return bucket
+
+    async def admit(self, service_name: str, path: str, headers: Dict[str, str], long_lived: bool = False) -> List[ConcurrencyLimiter]:
+        """Return the limiters holding a slot for this request; the caller must release them.
+
+        Long-lived streams (SSE, WebSocket) are charged against the rate limits
+        when they open but hold no concurrency slot: idle streams would otherwise
+        starve ordinary requests. They are bounded by their own connection caps.
+        """
+        tenant = headers.get(self.tenant_header) or "default"
+        bucket = self._tenant_bucket(tenant)
+        if bucket is not None:
+            wait = bucket.try_acquire()
+            if wait:
+                raise Rejected(429, "tenant rate limit exceeded", wait)
+        bucket = self.service_buckets.get(service_name)
+        if bucket is not None:
+            wait = bucket.try_acquire()
+            if wait:
+                raise Rejected(503, "service rate limit exceeded", wait)
+
+        if long_lived:
+            return []
+        priority = self.priority_for(service_name, path)
+        held: List[ConcurrencyLimiter] = []
+        try:
+            if self.tenant_concurrency > 0:
+                limiter = self.tenant_limiters.get(tenant)
+                if limiter is None:
+                    limiter = self.tenant_limiters[tenant] = ConcurrencyLimiter(
+                        self.tenant_concurrency, self.queue_size, self.queue_timeout, self.low_priority_queue_share
+                    )
+                await limiter.acquire(priority, 429, "tenant concurrency", self.shed_retry_after)
+                held.append(limiter)
+            limiter = self.service_limiters.get(service_name)
+            if limiter is not None:
+                await limiter.acquire(priority, 503, "service concurrency", self.shed_retry_after)
+                held.append(limiter)
+        except BaseException:
+            self.release(held, tenant)
+            raise
+        return held
+
+    def release(self, held: List[ConcurrencyLimiter], tenant: Optional[str] = None):
+        for limiter in held:
+            limiter.release()
+        if tenant is not None:
+            limiter = self.tenant_limiters.get(tenant)
+            if limiter is not None and limiter.idle:
+                del self.tenant_limiters[tenant]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tenant_header": self.tenant_header,
+            "tenant_rate": self.tenant_rate,
+            "tenant_concurrency": self.tenant_concurrency,
+            "tenants_tracked": len(self.tenant_buckets),
+            "services": {
+                name: {
+                    "rate_limit": self.service_buckets[name].rate if name in self.service_buckets else None,
+                    "concurrency": self.service_limiters[name].stats() if name in self.service_limiters else None,
+                }
+                for name in sorted(set(self.service_buckets) | set(self.service_limiters))
+            },
+            "tenants": {tenant: limiter.stats() for tenant, limiter in self.tenant_limiters.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """Sheds proxied requests and WebSocket handshakes before they reach upstream work; other routes are exempt."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        service_name, _, path = scope["path"][5:].partition("/")
+        if service_name not in self.controller.services:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        tenant = headers.get(self.controller.tenant_header) or "default"
+        websocket = scope["type"] == "websocket"
+        long_lived = websocket or wants_event_stream(headers.get("accept", ""))
+        try:
+            with timed_phase("admission"):
+                held = await self.controller.admit(service_name, path, headers, long_lived)
+        except Rejected as e:
+            ADMISSION_REJECTED.inc((service_name, e.reason))
+            if websocket:
+                # Closing before accepting rejects the handshake (HTTP 403); 1013 is "try again later".
+                await send({"type": "websocket.close", "code": 1013, "reason": f"Request rejected: {e.reason}"})
+                return
+            body = json.dumps({"detail": f"Request rejected: {e.reason}"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": e.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(math.ceil(e.retry_after), 1)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(held, tenant)
@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import json
+import logging
+import math
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import quote, urlencode
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from admission import AdmissionController, Rejected
+from metrics import ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str, str, Request], Awaitable[Response]]
+
+BATCH_METHODS = {"GET", "POST", "PUT", "DELETE", "PATCH"}
+PARENT_HEADER_EXCLUDES = {"host", "content-length", "content-type", "accept-encoding", "transfer-encoding", "connection"}
+RESULT_HEADER_EXCLUDES = {"content-length", "content-encoding", "transfer-encoding", "connection"}
+
+
+class BatchItem:
+    __slots__ = ("index", "id", "method", "service_name", "path", "query", "headers", "body")
+
+    def __init__(self, index: int, spec: Dict[str, Any]):
+        if not isinstance(spec, dict) or not spec.get("service") or "path" not in spec:
+            raise ValueError(f"Sub-request {index} needs 'service' and 'path'")
+        self.index = index
+        self.id = str(spec.get("id", index))
+        self.method = str(spec.get("method", "GET")).upper()
+        if self.method not in BATCH_METHODS:
+            raise ValueError(f"Sub-request {index} has unsupported method '{self.method}'")
+        self.service_name = str(spec["service"])
+        self.path = str(spec["path"]).lstrip("/")
+        self.query = spec.get("query") or {}
+        if not isinstance(self.query, dict):
+            raise ValueError(f"Sub-request {index} 'query' must be an object")
+        headers = spec.get("headers") or {}
+        if not isinstance(headers, dict):
+            raise ValueError(f"Sub-request {index} 'headers' must be an object")
+        self.headers = {str(k).lower(): str(v) for k, v in headers.items()}
+        for name, value in self.headers.items():
+            # Headers end up in an ASGI scope and then in an httpx request, which only sends ASCII.
+            if not (name + value).isascii():
+                raise ValueError(f"Sub-request {index} header '{name}' must be ASCII")
+            if any(char in name + value for char in "\r\n\0"):
+                raise ValueError(f"Sub-request {index} header '{name}' contains a line break")
+        body = spec.get("body")
+        if body is None:
+            self.body = b""
+        elif isinstance(body, str):
+            self.body = body.encode()
+        else:
+            self.body = json.dumps(body, separators=(",", ":")).encode()
+            self.headers.setdefault("content-type", "application/json")
+
+
+def parse_items(specs: Any, max_items: int) -> List[BatchItem]:
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("'requests' must be a non-empty list")
+    if len(specs) > max_items:
+        raise ValueError(f"A batch may contain at most {max_items} requests")
+    return [BatchItem(index, spec) for index, spec in enumerate(specs)]
+
+
+def build_sub_request(parent: Request, item: BatchItem) -> Request:
+    headers = {k: v for k, v in parent.headers.items() if k not in PARENT_HEADER_EXCLUDES}
+    headers.update(item.headers)
+    # Bodies are embedded in the batch reply, so sub-requests must come back uncompressed.
+    headers["accept-encoding"] = "identity"
+    if item.body:
+        headers["content-length"] = str(len(item.body))
+    path = f"/api/{item.service_name}/{item.path}"
+    scope = {
+        "type": "http",
+        "asgi": parent.scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent.scope.get("http_version", "1.1"),
+        "method": item.method,
+        "scheme": parent.scope.get("scheme", "http"),
+        "path": path,
+        "raw_path": quote(path).encode(),
+        "root_path": "",
+        "query_string": urlencode(item.query, doseq=True).encode(),
+        "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+        "client": parent.scope.get("client"),
+        "server": parent.scope.get("server"),
+        "state": {},
+    }
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            return {"type": "http.disconnect"}
+        body_sent = True
+        return {"type": "http.request", "body": item.body, "more_body": False}
+
+    return Request(scope, receive)
+
+
+async def read_response_body(response: Response) -> bytes:
+    if isinstance(response, StreamingResponse):
+        chunks = []
+        async for chunk in response.body_iterator:
+            chunks.append(chunk if isinstance(chunk, bytes) else chunk.encode())
+        return b"".join(chunks)
+    return response.body
+
+
+def _result(item: BatchItem, status: int, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"id": item.id, "index": item.index, "status": status, "headers": headers}
+    content_type = headers.get("content-type", "")
+    if not body:
+        result["body"] = None
+    elif "json" in content_type:
+        try:
+            result["body"] = json.loads(body)
+        except ValueError:
+            result["body"] = body.decode("utf-8", errors="replace")
+    else:
+        try:
+            result["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            result["body"] = base64.b64encode(body).decode()
+            result["body_encoding"] = "base64"
+    return result
+
+
+async def execute_item(
+    parent: Request,
+    item: BatchItem,
+    handler: Handler,
+    services: Dict[str, Any],
+    admission: Optional[AdmissionController] = None,
+) -> Dict[str, Any]:
+    if item.service_name not in services:
+        return {"id": item.id, "index": item.index, "status": 404, "error": f"Service '{item.service_name}' not found"}
+    sub_request = build_sub_request(parent, item)
+    held, tenant = [], None
+    if admission is not None:
+        # Sub-requests skip AdmissionMiddleware, so each one is admitted here like a direct request.
+        headers = dict(sub_request.headers)
+        tenant = headers.get(admission.tenant_header) or "default"
+        try:
+            held = await admission.admit(item.service_name, item.path, headers)
+        except Rejected as e:
+            ADMISSION_REJECTED.inc((item.service_name, e.reason))
+            return {
+                "id": item.id,
+                "index": item.index,
+                "status": e.status_code,
+                "headers": {"retry-after": str(max(math.ceil(e.retry_after), 1))},
+                "error": f"Request rejected: {e.reason}",
+            }
+    try:
+        response = await handler(item.service_name, item.path, sub_request)
+        body = await read_response_body(response)
+        headers = {k: v for k, v in response.headers.items() if k not in RESULT_HEADER_EXCLUDES}
+        return _result(item, response.status_code, headers, body)
+    except HTTPException as e:
+        return {"id": item.id, "index": item.index, "status": e.status_code, "error": e.detail}
+    except Exception as e:
+        logger.error("Error in batch sub-request to %s: %s %s: %s", item.service_name, item.method, item.path, e)
+        return {"id": item.id, "index": item.index, "status": 500, "error": "Internal server error"}
+    finally:
+        if admission is not None:
+            admission.release(held, tenant)
+
+
+async def run_batch(
+    parent: Request,
+    items: List[BatchItem],
+    handler: Handler,
+    services: Dict[str, Any],
+    concurrency: int,
+    deadline: float,
+    admission: Optional[AdmissionController] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run sub-requests concurrently and yield each result as soon as it completes."""
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run_item(item: BatchItem) -> Dict[str, Any]:
+        async with semaphore:
+            return await execute_item(parent, item, handler, services, admission)
+
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + deadline
+    tasks = {asyncio.ensure_future(run_item(item)): item for item in items}
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = deadline_at - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+        for task in pending:
+            task.cancel()
+            item = tasks[task]
+            yield {"id": item.id, "index": item.index, "status": 504, "error": "Batch deadline exceeded"}
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def ndjson_lines(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for result in results:
+        yield json.dumps(result, separators=(",", ":")).encode() + b"\n"
+
+
+def parse_concurrency(value: Optional[Any], maximum: int) -> int:
+    if value is None:
+        return maximum
+    concurrency = float(value)
+    if not math.isfinite(concurrency):
+        raise ValueError("'concurrency' must be a finite number")
+    return min(max(int(concurrency), 1), maximum)
+
+
+def parse_deadline(value: Optional[Any], default: float, maximum: float) -> float:
+    if value is None:
+        return default
+    deadline = float(value) / 1000
+    if math.isnan(deadline):
+        raise ValueError("'deadline_ms' must be a number")
+    return min(max(deadline, 0.001), maximum)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Load-test and microbenchmark suite for the backend proxy.
+
+Starts local stub upstreams for every key in ``main.SERVICES``, drives
+``main.app`` with concurrent load and reports throughput and latency
+percentiles per scenario as JSON, so runs can be compared between commits.
+
+    python benchmarks/bench_proxy.py --output results.json
+    python benchmarks/bench_proxy.py --scenario small_json_get --mode asgi
+    python benchmarks/bench_proxy.py --compare baseline.json --fail-on-regression 10
+
+``--mode http`` (default) runs the proxy under uvicorn in its own process and
+measures it over real sockets. ``--mode asgi`` calls the app in-process through
+httpx's ASGI transport, which isolates proxy overhead from HTTP parsing.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROXY_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, PROXY_DIR)
+
+from stub_upstreams import free_port, start_stub_upstreams, wait_until_ready  # noqa: E402
+
+RequestSpec = Tuple[str, str, Optional[bytes]]
+
+LARGE_BODY = b"x" * 1_000_000
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "small_json_get": {
+        "stub": {"payload_bytes": 512},
+        "plan": [("GET", "/api/sis/students", None)],
+    },
+    "large_body": {
+        "stub": {"payload_bytes": 1_000_000},
+        "plan": [("POST", "/api/analytics/reports", LARGE_BODY), ("GET", "/api/analytics/exports", None)],
+        "requests_scale": 0.1,
+    },
+    "outage_fallback": {
+        "stub": {},
+        "down": "all",
+        "plan": [("GET", "/api/sis/students", None), ("GET", "/api/lms/courses", None), ("GET", "/api/admin/tenants", None)],
+    },
+    "mixed_methods": {
+        "stub": {"payload_bytes": 2048, "latency_ms": 5},
+        "plan": [
+            ("GET", "/api/sis/students", None),
+            ("POST", "/api/lms/courses", b'{"title": "Mathematics - Grade 10"}'),
+            ("PUT", "/api/erp/employees/1", b'{"status": "Active"}'),
+            ("PATCH", "/api/exams/exams/1", b'{"duration": 90}'),
+            ("DELETE", "/api/bpm/workflows/1", None),
+            ("GET", "/api/admin/tenants", None),
+        ],
+    },
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_load(client: httpx.AsyncClient, plan: List[RequestSpec], concurrency: int, total: int, warmup: int) -> Dict[str, Any]:
+    for i in range(warmup):
+        method, path, body = plan[i % len(plan)]
+        try:
+            await client.request(method, path, content=body)
+        except httpx.HTTPError:
+            pass
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    received = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal received
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            method, path, body = plan[i % len(plan)]
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, content=body)
+                statuses[str(response.status_code)] += 1
+                received += len(response.content)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "bytes_received": received,
+        "status_codes": dict(statuses),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+def _proxy_env(urls: Dict[str, str], log_level: str) -> Dict[str, str]:
+    env = {f"{name.upper()}_SERVICE_URL": url for name, url in urls.items()}
+    env["BENCH_PROXY_LOG_LEVEL"] = log_level
+    return env
+
+
+def _import_app(env: Dict[str, str]):
+    os.environ.update(env)
+    os.chdir(PROXY_DIR)
+    import main
+
+    logging.getLogger().setLevel(env["BENCH_PROXY_LOG_LEVEL"])
+    logging.getLogger("httpx").setLevel(env["BENCH_PROXY_LOG_LEVEL"])
+    return main.app
+
+
+def _serve_proxy(env: Dict[str, str], port: int):
+    import uvicorn
+
+    app = _import_app(env)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def _client_limits(concurrency: int) -> httpx.Limits:
+    return httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+
+def _run_asgi(env: Dict[str, str], plan: List[RequestSpec], concurrency: int, total: int, warmup: int, results):
+    app = _import_app(env)
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://proxy", timeout=30.0) as client:
+                return await run_load(client, plan, concurrency, total, warmup)
+
+    results.put(asyncio.run(run()))
+
+
+def run_scenario(name: str, args, service_names: List[str]) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    stub_options = dict(scenario["stub"])
+    if args.latency_ms is not None:
+        stub_options["latency_ms"] = args.latency_ms
+    if args.payload_bytes is not None:
+        stub_options["payload_bytes"] = args.payload_bytes
+    if args.failure_rate is not None:
+        stub_options["failure_rate"] = args.failure_rate
+    down = service_names if scenario.get("down") == "all" else scenario.get("down", ())
+    total = max(int(args.requests * scenario.get("requests_scale", 1.0)), 1)
+
+    spawn = multiprocessing.get_context("spawn")
+    stubs, urls = start_stub_upstreams(service_names, down=down, **stub_options)
+    env = _proxy_env(urls, args.proxy_log_level)
+    proxy = None
+    try:
+        if args.mode == "asgi":
+            results = spawn.Queue()
+            proxy = spawn.Process(target=_run_asgi, args=(env, scenario["plan"], args.concurrency, total, args.warmup, results))
+            proxy.start()
+            result = results.get()
+        else:
+            port = free_port()
+            proxy = spawn.Process(target=_serve_proxy, args=(env, port), daemon=True)
+            proxy.start()
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_ready([f"{base_url}/health"], timeout=30.0)
+
+            async def run():
+                async with httpx.AsyncClient(base_url=base_url, limits=_client_limits(args.concurrency), timeout=30.0) as client:
+                    return await run_load(client, scenario["plan"], args.concurrency, total, args.warmup)
+
+            result = asyncio.run(run())
+    finally:
+        for process in (proxy, stubs):
+            if process is not None and process.is_alive():
+                process.terminate()
+                process.join(5)
+
+    result["stub"] = stub_options
+    result["services_down"] = sorted(down)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=PROXY_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    regressed = False
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        throughput_delta = (current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"] * 100 if previous["throughput_rps"] else 0.0
+        p99_delta = (current["latency_ms"]["p99"] - previous["latency_ms"]["p99"]) / previous["latency_ms"]["p99"] * 100 if previous["latency_ms"]["p99"] else 0.0
+        flag = ""
+        if throughput_delta < -threshold or p99_delta > threshold:
+            regressed = True
+            flag = "  REGRESSION"
+        print(
+            f"{name:<18} throughput {previous['throughput_rps']:>10.1f} -> {current['throughput_rps']:>10.1f} rps ({throughput_delta:+.1f}%)"
+            f"  p99 {previous['latency_ms']['p99']:>8.2f} -> {current['latency_ms']['p99']:>8.2f} ms ({p99_delta:+.1f}%){flag}",
+            file=sys.stderr,
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend proxy against local stub upstreams.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--mode", choices=("http", "asgi"), default="http")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario (scaled down for large bodies)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, help="Override stub latency for every scenario")
+    parser.add_argument("--payload-bytes", type=int, help="Override stub response size for every scenario")
+    parser.add_argument("--failure-rate", type=float, help="Override stub 503 rate for every scenario")
+    parser.add_argument("--proxy-log-level", default="WARNING")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT", help="Exit 1 if throughput drops or p99 grows by more than PCT%%")
+    args = parser.parse_args()
+
+    os.chdir(PROXY_DIR)
+    from main import SERVICES
+
+    # Importing main configures INFO logging; keep the load generator itself quiet.
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    service_names = list(SERVICES)
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "mode": args.mode,
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        print(f"Running {name}...", file=sys.stderr)
+        results["scenarios"][name] = run_scenario(name, args, service_names)
+        summary = results["scenarios"][name]
+        print(
+            f"  {summary['throughput_rps']} rps, p50 {summary['latency_ms']['p50']} ms, "
+            f"p95 {summary['latency_ms']['p95']} ms, p99 {summary['latency_ms']['p99']} ms, errors {summary['errors']}",
+            file=sys.stderr,
+        )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressed = compare(results, json.load(f), args.fail_on_regression if args.fail_on_regression is not None else 10.0)
+        if regressed and args.fail_on_regression is not None:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Local stub upstreams for benchmarking the backend proxy.
+
+Each stub is a minimal raw ASGI app so that the stubs themselves are never the
+bottleneck. Latency, payload size and failure rate are configurable.
+"""
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+from typing import Dict, Iterable
+
+import httpx
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_payload(payload_bytes: int) -> bytes:
+    record = {"id": "0", "name": "Student", "grade": "Grade 10", "section": "A", "status": "Active"}
+    record_size = len(json.dumps(record)) + 1
+    count = max(payload_bytes // record_size, 1)
+    data = [dict(record, id=str(i)) for i in range(count)]
+    return json.dumps({"data": data, "total": count, "page": 1, "per_page": count}).encode()
+
+
+class StubUpstream:
+    def __init__(self, latency_ms: float = 0.0, payload_bytes: int = 512, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.payload = build_payload(payload_bytes)
+        self.random = random.Random(seed)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        more_body = True
+        while more_body:
+            message = await receive()
+            more_body = message.get("more_body", False)
+
+        if scope["path"] == "/health":
+            await self._respond(send, 200, b'{"status":"healthy"}')
+            return
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            await self._respond(send, 503, b'{"detail":"stub failure"}')
+            return
+        await self._respond(send, 200, self.payload)
+
+    async def _respond(self, send, status: int, body: bytes):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _serve(ports: Dict[str, int], latency_ms: float, payload_bytes: int, failure_rate: float):
+    servers = []
+    for index, port in enumerate(ports.values()):
+        stub = StubUpstream(latency_ms, payload_bytes, failure_rate, seed=index)
+        config = uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        servers.append(uvicorn.Server(config))
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def _run(ports: Dict[str, int], latency_ms: float, payload_bytes: int, failure_rate: float):
+    asyncio.run(_serve(ports, latency_ms, payload_bytes, failure_rate))
+
+
+def wait_until_ready(urls: Iterable[str], timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    pending = list(urls)
+    while pending:
+        url = pending[0]
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                pending.pop(0)
+                continue
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not become ready")
+        time.sleep(0.05)
+
+
+def start_stub_upstreams(
+    service_names: Iterable[str],
+    latency_ms: float = 0.0,
+    payload_bytes: int = 512,
+    failure_rate: float = 0.0,
+    down: Iterable[str] = (),
+):
+    """Start one stub per service in a child process.
+
+    Services listed in ``down`` get a URL with nothing listening so the proxy
+    sees connection errors. Returns (process, {service_name: url}).
+    """
+    down = set(down)
+    ports = {name: free_port() for name in service_names}
+    urls = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+    live = {name: port for name, port in ports.items() if name not in down}
+    process = multiprocessing.Process(target=_run, args=(live, latency_ms, payload_bytes, failure_rate), daemon=True)
+    process.start()
+    wait_until_ready(f"{urls[name]}/health" for name in live)
+    return process, urls
@@ -0,0 +1,100 @@
+import logging
+import time
+from typing import Any, Dict
+
+from settings import service_env
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, service_name: str, retry_after: float):
+        super().__init__(f"Circuit breaker for {service_name} is open")
+        self.service_name = service_name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        service_name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.service_name = service_name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.half_open_started = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls, service_name: str) -> "CircuitBreaker":
+        return cls(
+            service_name,
+            failure_threshold=int(service_env(service_name, "BREAKER_FAILURE_THRESHOLD", "CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5")),
+            recovery_timeout=float(service_env(service_name, "BREAKER_RECOVERY_TIMEOUT", "CIRCUIT_BREAKER_RECOVERY_TIMEOUT", "30")),
+            half_open_max_calls=int(service_env(service_name, "BREAKER_HALF_OPEN_MAX_CALLS", "CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS", "1")),
+        )
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.info("Circuit breaker for %s: %s -> %s", self.service_name, self.state, state)
+            self.state = state
+
+    def before_request(self):
+        """Raise CircuitOpenError instead of letting a request reach a failing upstream."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(self.service_name, self.opened_at + self.recovery_timeout - now)
+            self._transition(HALF_OPEN)
+            self.half_open_calls = 0
+        if self.state == HALF_OPEN:
+            # Trial calls that never report back must not wedge the breaker half-open forever.
+            if self.half_open_calls and now - self.half_open_started > self.recovery_timeout:
+                self.half_open_calls = 0
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.service_name, self.recovery_timeout)
+            self.half_open_calls += 1
+            self.half_open_started = now
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+            self.half_open_calls = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self._transition(OPEN)
+            self.opened_at = time.monotonic()
+            self.half_open_calls = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+        if self.state == OPEN:
+            snapshot["retry_after"] = round(max(self.opened_at + self.recovery_timeout - time.monotonic(), 0.0), 3)
+        return snapshot
@@ -0,0 +1,184 @@
+import zlib
+from typing import AsyncIterator, Dict, MutableMapping, Optional, Tuple
+
+from metrics import timed_phase
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "application/xml", "text/", "+json", "+xml")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def accepts(accepted: Dict[str, float], coding: str) -> bool:
+    return accepted.get(coding, accepted.get("*", 0.0)) > 0
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith("text/event-stream"):
+        return False
+    return any(marker in content_type for marker in COMPRESSIBLE_TYPES)
+
+
+class Compressor:
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int):
+        self.coding = coding
+        if coding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.coding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class Decompressor:
+    def __init__(self, coding: str):
+        self.coding = coding
+        if coding == "br":
+            self._decompressor = brotli.Decompressor()
+        elif coding == "gzip":
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self._decompressor = zlib.decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self._decompressor.process(data)
+        return self._decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        if self.coding == "br":
+            return b""
+        return self._decompressor.flush()
+
+
+class CompressionPolicy:
+    """Decides per response whether to pass bytes through, decode them, or compress them."""
+
+    def __init__(self, enabled: bool = True, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.codings = ("br", "gzip") if brotli is not None else ("gzip",)
+        self.decodable = {"gzip", "deflate"} | ({"br"} if brotli is not None else set())
+        self.passthrough = 0
+        self.compressed = 0
+        self.decoded = 0
+
+    def choose(self, accepted: Dict[str, float]) -> Optional[str]:
+        best, best_q = None, 0.0
+        for coding in self.codings:
+            q = accepted.get(coding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def _plan(self, accept_encoding: str, headers: MutableMapping[str, str], size: Optional[int]) -> Tuple[Optional[str], Optional[str]]:
+        """Return (coding to decode from, coding to encode to); (None, None) means pass through."""
+        accepted = parse_accept_encoding(accept_encoding)
+        upstream_coding = headers.get("content-encoding", "identity").strip().lower()
+        if upstream_coding != "identity":
+            if accepts(accepted, upstream_coding) or upstream_coding not in self.decodable:
+                return None, None
+            return upstream_coding, None
+        if not self.enabled or (size is not None and size < self.min_size):
+            return None, None
+        if not is_compressible(headers.get("content-type", "")):
+            return None, None
+        return None, self.choose(accepted)
+
+    def _rewrite_headers(self, headers: MutableMapping[str, str], coding: Optional[str]):
+        headers.pop("content-length", None)
+        headers.pop("content-encoding", None)
+        if coding is not None:
+            headers["content-encoding"] = coding
+            vary = headers.get("vary")
+            if not vary:
+                headers["vary"] = "Accept-Encoding"
+            elif "accept-encoding" not in vary.lower():
+                headers["vary"] = f"{vary}, Accept-Encoding"
+
+    def negotiate_body(self, accept_encoding: str, headers: MutableMapping[str, str], body: bytes) -> Tuple[MutableMapping[str, str], bytes]:
+        decode_from, encode_to = self._plan(accept_encoding, headers, len(body))
+        if decode_from is None and encode_to is None:
+            self.passthrough += 1
+            return headers, body
+        with timed_phase("compress"):
+            if decode_from is not None:
+                decompressor = Decompressor(decode_from)
+                body = decompressor.decompress(body) + decompressor.flush()
+                self.decoded += 1
+            if encode_to is not None:
+                compressor = Compressor(encode_to, self.gzip_level, self.brotli_quality)
+                body = compressor.compress(body) + compressor.flush()
+                self.compressed += 1
+        self._rewrite_headers(headers, encode_to)
+        return headers, body
+
+    def negotiate_stream(self, accept_encoding: str, headers: MutableMapping[str, str], chunks: AsyncIterator[bytes]) -> Tuple[MutableMapping[str, str], AsyncIterator[bytes]]:
+        content_length = headers.get("content-length")
+        decode_from, encode_to = self._plan(accept_encoding, headers, int(content_length) if content_length else None)
+        if decode_from is None and encode_to is None:
+            self.passthrough += 1
+            return headers, chunks
+        self._rewrite_headers(headers, encode_to)
+        if decode_from is not None:
+            self.decoded += 1
+        if encode_to is not None:
+            self.compressed += 1
+        return headers, self._transcode(chunks, decode_from, encode_to)
+
+    async def _transcode(self, chunks: AsyncIterator[bytes], decode_from: Optional[str], encode_to: Optional[str]) -> AsyncIterator[bytes]:
+        decompressor = Decompressor(decode_from) if decode_from else None
+        compressor = Compressor(encode_to, self.gzip_level, self.brotli_quality) if encode_to else None
+        async for chunk in chunks:
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        tail = decompressor.flush() if decompressor is not None else b""
+        if compressor is not None:
+            tail = compressor.compress(tail) + compressor.flush()
+        if tail:
+            yield tail
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "min_size": self.min_size,
+            "codings": list(self.codings),
+            "passthrough": self.passthrough,
+            "compressed": self.compressed,
+            "decoded": self.decoded,
+        }
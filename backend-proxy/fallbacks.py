@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Response
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class Fallback:
+    __slots__ = ("service_name", "method", "path", "body", "status_code", "media_type", "hits")
+
+    def __init__(self, service_name: str, method: str, path: str, body: bytes, status_code: int, media_type: str):
+        self.service_name = service_name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.status_code = status_code
+        self.media_type = media_type
+        self.hits = 0
+
+    def response(self, body: Optional[bytes] = None) -> Response:
+        self.hits += 1
+        return Response(
+            content=self.body if body is None else body,
+            status_code=self.status_code,
+            media_type=self.media_type,
+            headers={"x-fallback": "static"}
+        )
+
+
+class FallbackRegistry:
+    """Fallback payloads keyed by service, method and path, serialized once at registration."""
+
+    def __init__(self):
+        self.exact: Dict[Tuple[str, str, str], Fallback] = {}
+        self.patterns: Dict[Tuple[str, str], List[Tuple[re.Pattern, Fallback]]] = {}
+
+    def register(self, service_name: str, method: str, path: str, payload: Any, status_code: int = 200, media_type: str = "application/json") -> Fallback:
+        method = method.upper()
+        path = path.strip("/")
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, separators=(",", ":")).encode()
+        fallback = Fallback(service_name, method, path, body, status_code, media_type)
+        if _PLACEHOLDER.search(path):
+            pattern = re.compile("^" + _PLACEHOLDER.sub(r"(?P<\1>[^/]+)", re.escape(path).replace(r"\{", "{").replace(r"\}", "}")) + "$")
+            self.patterns.setdefault((service_name, method), []).append((pattern, fallback))
+        else:
+            self.exact[(service_name, method, path)] = fallback
+        return fallback
+
+    def load_file(self, file_path: str) -> int:
+        """Register fallbacks from a JSON file holding one definition or a list of them.
+
+        Each definition looks like {"service": "sis", "method": "GET", "path": "students/{id}",
+        "status_code": 200, "body": {...}}.
+        """
+        with open(file_path, "r") as f:
+            definitions = json.load(f)
+        if isinstance(definitions, dict):
+            definitions = [definitions]
+        for definition in definitions:
+            self.register(
+                definition["service"],
+                definition.get("method", "GET"),
+                definition["path"],
+                definition["body"],
+                status_code=definition.get("status_code", 200),
+                media_type=definition.get("media_type", "application/json"),
+            )
+        return len(definitions)
+
+    def load_directory(self, directory: str) -> int:
+        if not os.path.isdir(directory):
+            return 0
+        loaded = 0
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                loaded += self.load_file(os.path.join(directory, filename))
+            except Exception as e:
+                logger.error("Error loading fallbacks from %s: %s", filename, e)
+        return loaded
+
+    def lookup(self, service_name: str, method: str, path: str) -> Optional[Fallback]:
+        path = path.strip("/")
+        fallback = self.exact.get((service_name, method, path))
+        if fallback is not None:
+            return fallback
+        for pattern, fallback in self.patterns.get((service_name, method), ()):
+            if pattern.match(path):
+                return fallback
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        fallbacks = list(self.exact.values()) + [f for entries in self.patterns.values() for _, f in entries]
+        return {
+            f"{f.method} {f.service_name}/{f.path}": {"hits": f.hits, "status_code": f.status_code, "bytes": len(f.body)}
+            for f in fallbacks
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import suppress
+from typing import Any, Dict, List, Optional
+
+from upstream_pool import UpstreamPool
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceHealth:
+    def __init__(self, service_name: str, urls: List[str], history_size: int):
+        self.service_name = service_name
+        self.urls = urls
+        self.url = urls[0]
+        self.history: deque = deque(maxlen=history_size)
+        self.last: Dict[str, Any] = {"status": "unknown", "url": self.url}
+
+    def record(self, status: str, response_time: Optional[float], error: Optional[str] = None, replicas: Optional[Dict[str, str]] = None):
+        checked_at = time.time()
+        self.history.append((checked_at, status == "healthy", response_time))
+        self.last = {"status": status, "url": self.url, "checked_at": checked_at}
+        if response_time is not None:
+            self.last["response_time"] = response_time
+        if error is not None:
+            self.last["error"] = error
+        if replicas is not None:
+            self.last["replicas"] = replicas
+
+    def summary(self) -> Dict[str, Any]:
+        summary = dict(self.last)
+        if not self.history:
+            return summary
+        latencies = sorted(sample[2] for sample in self.history if sample[2] is not None)
+        summary["availability"] = round(sum(1 for sample in self.history if sample[1]) / len(self.history), 4)
+        summary["samples"] = len(self.history)
+        if latencies:
+            summary["latency_avg"] = round(sum(latencies) / len(latencies), 6)
+            summary["latency_p50"] = latencies[len(latencies) // 2]
+            summary["latency_p95"] = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+        return summary
+
+
+class HealthProber:
+    """Probes every upstream concurrently on an interval and caches the result."""
+
+    def __init__(
+        self,
+        services: Dict[str, List[str]],
+        pools: Dict[str, UpstreamPool],
+        interval: float = 15.0,
+        timeout: float = 2.0,
+        history_size: int = 60,
+    ):
+        self.services = services
+        self.pools = pools
+        self.interval = interval
+        self.timeout = timeout
+        self.health = {name: ServiceHealth(name, urls, history_size) for name, urls in services.items()}
+        self.snapshot: Dict[str, Dict[str, Any]] = {name: h.summary() for name, h in self.health.items()}
+        self._task: Optional[asyncio.Task] = None
+        self._probe: Optional[asyncio.Task] = None
+
+    async def _probe_replica(self, service_name: str, url: str):
+        try:
+            response = await self.pools[service_name].request("GET", f"{url}/health", timeout=self.timeout)
+            return ("healthy" if response.status_code == 200 else "unhealthy"), response.elapsed.total_seconds(), None
+        except Exception as e:
+            return "unavailable", None, str(e) or type(e).__name__
+
+    async def _probe_service(self, service_name: str):
+        health = self.health[service_name]
+        results = await asyncio.gather(*(self._probe_replica(service_name, url) for url in health.urls))
+        if len(results) == 1:
+            health.record(*results[0])
+            return
+        # A service is healthy while any replica is; the fastest healthy replica sets its latency.
+        statuses = [status for status, _, _ in results]
+        status = "healthy" if "healthy" in statuses else ("unhealthy" if "unhealthy" in statuses else "unavailable")
+        times = [elapsed for s, elapsed, _ in results if s == "healthy"]
+        errors = [error for _, _, error in results if error]
+        health.record(
+            status,
+            min(times) if times else None,
+            errors[0] if status != "healthy" and errors else None,
+            replicas={url: result[0] for url, result in zip(health.urls, results)},
+        )
+
+    async def _probe_all(self):
+        await asyncio.gather(*(self._probe_service(name) for name in self.services))
+        self.snapshot = {name: h.summary() for name, h in self.health.items()}
+
+    async def probe_all(self) -> Dict[str, Dict[str, Any]]:
+        # Callers arriving while a probe is running share it instead of starting another.
+        if self._probe is None or self._probe.done():
+            self._probe = asyncio.create_task(self._probe_all())
+        await asyncio.shield(self._probe)
+        return self.snapshot
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error("Health probe failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._probe):
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        self._task = None
+        self._probe = None
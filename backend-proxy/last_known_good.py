@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STALE_WARNING = '110 - "Response is Stale"'
+REVALIDATION_FAILED_WARNING = '111 - "Revalidation Failed"'
+
+
+class StoredResponse:
+    __slots__ = ("status_code", "headers", "body", "stored_at", "size")
+
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes, stored_at: Optional[float] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        # Wall clock rather than monotonic so ages stay right after a restart.
+        self.stored_at = time.time() if stored_at is None else stored_at
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers.items())
+
+    @property
+    def age(self) -> int:
+        return max(int(time.time() - self.stored_at), 0)
+
+
+class LastKnownGoodStore:
+    """Byte-bounded LRU of the latest successful GET responses, optionally persisted to SQLite."""
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_entry_bytes: int = 1024 * 1024,
+        max_age: float = 86400.0,
+        path: Optional[str] = None,
+        flush_interval: float = 5.0,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_age = max_age
+        self.path = path or None
+        self.flush_interval = flush_interval
+        self.entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self.size = 0
+        self.dirty: Set[str] = set()
+        self.deleted: Set[str] = set()
+        self.stores = 0
+        self.served = 0
+        self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.age > self.max_age:
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        self.served += 1
+        return entry
+
+    def put(self, key: str, status_code: int, headers: Dict[str, str], body: bytes, stored_at: Optional[float] = None) -> bool:
+        entry = StoredResponse(status_code, dict(headers), body, stored_at)
+        if entry.size > self.max_entry_bytes:
+            return False
+        self._remove(key)
+        self.entries[key] = entry
+        self.size += entry.size
+        self.dirty.add(key)
+        self.deleted.discard(key)
+        self.stores += 1
+        while self.size > self.max_bytes and self.entries:
+            evicted_key = next(iter(self.entries))
+            self._remove(evicted_key)
+            self.evictions += 1
+        return True
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            self.dirty.discard(key)
+            if self.path:
+                self.deleted.add(key)
+
+    async def tee(self, key: str, status_code: int, headers: Dict[str, str], chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pass chunks through and store the body once it has been streamed completely."""
+        parts: Optional[List[bytes]] = []
+        size = 0
+        async for chunk in chunks:
+            if parts is not None:
+                size += len(chunk)
+                if size > self.max_entry_bytes:
+                    parts = None
+                else:
+                    parts.append(chunk)
+            yield chunk
+        if parts is not None:
+            self.put(key, status_code, headers, b"".join(parts))
+
+    # Persistence. SQLite calls run in a worker thread; the loop only hands over snapshots.
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, status_code INTEGER, headers TEXT, body BLOB, stored_at REAL)"
+            )
+        return self._db
+
+    def _read(self) -> List[Tuple[str, int, str, bytes, float]]:
+        cutoff = time.time() - self.max_age
+        with self._db_lock:
+            return self._connect().execute(
+                "SELECT key, status_code, headers, body, stored_at FROM responses WHERE stored_at >= ? ORDER BY stored_at", (cutoff,)
+            ).fetchall()
+
+    def _write(self, rows: List[Tuple[str, int, str, bytes, float]], deleted: List[str]):
+        with self._db_lock:
+            db = self._connect()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", rows)
+                db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in deleted])
+                db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.max_age,))
+
+    async def load(self) -> int:
+        if not self.path:
+            return 0
+        rows = await asyncio.to_thread(self._read)
+        for key, status_code, headers, body, stored_at in rows:
+            self.put(key, status_code, json.loads(headers), body, stored_at)
+        self.dirty.clear()
+        return len(self.entries)
+
+    async def flush(self) -> int:
+        if not self.path or not (self.dirty or self.deleted):
+            return 0
+        rows = [
+            (key, entry.status_code, json.dumps(entry.headers), entry.body, entry.stored_at)
+            for key, entry in ((key, self.entries.get(key)) for key in self.dirty)
+            if entry is not None
+        ]
+        deleted = list(self.deleted)
+        self.dirty.clear()
+        self.deleted.clear()
+        await asyncio.to_thread(self._write, rows, deleted)
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Failed to persist last-known-good responses: %s", e)
+
+    def start(self):
+        if self.path and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self.path:
+            await self.flush()
+            with self._db_lock:
+                if self._db is not None:
+                    self._db.close()
+                    self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "persisted_to": self.path,
+            "stores": self.stores,
+            "served": self.served,
+            "evictions": self.evictions,
+        }
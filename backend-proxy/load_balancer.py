@@ -0,0 +1,151 @@
+import logging
+import math
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from settings import service_env
+
+logger = logging.getLogger(__name__)
+
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+
+
+def parse_replicas(value: str) -> List[str]:
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+def route_to(request: httpx.Request, replica_url: str):
+    # Replicas of a service share paths, so only the origin of the built request changes.
+    origin = httpx.URL(replica_url)
+    request.url = request.url.copy_with(scheme=origin.scheme, host=origin.host, port=origin.port)
+    request.headers["host"] = request.url.netloc.decode("ascii")
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.ewma = 0.0
+        self.last_update = 0.0
+        self.consecutive_failures = 0
+        self.times_ejected = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def score(self) -> float:
+        # Peak-EWMA: expected latency scaled by the work already queued on the replica.
+        return self.ewma * (self.in_flight + 1)
+
+
+class ReplicaSet:
+    """Picks a replica per upstream call and passively ejects replicas that keep failing."""
+
+    def __init__(
+        self,
+        service_name: str,
+        urls: List[str],
+        strategy: str = LEAST_OUTSTANDING,
+        ejection_threshold: int = 3,
+        ejection_duration: float = 30.0,
+        max_ejection_duration: float = 300.0,
+        max_ejection_percent: float = 50.0,
+        ewma_decay: float = 10.0,
+    ):
+        if not urls:
+            raise ValueError(f"Service {service_name} has no replica URLs")
+        self.service_name = service_name
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self.ejection_threshold = ejection_threshold
+        self.ejection_duration = ejection_duration
+        self.max_ejection_duration = max_ejection_duration
+        self.max_ejection_percent = max_ejection_percent
+        self.ewma_decay = ewma_decay
+        self.random = random.Random()
+
+    @classmethod
+    def from_env(cls, service_name: str, urls: List[str]) -> "ReplicaSet":
+        return cls(
+            service_name,
+            urls,
+            strategy=service_env(service_name, "LB_STRATEGY", "LB_STRATEGY", LEAST_OUTSTANDING),
+            ejection_threshold=int(service_env(service_name, "LB_EJECTION_THRESHOLD", "LB_EJECTION_THRESHOLD", "3")),
+            ejection_duration=float(service_env(service_name, "LB_EJECTION_DURATION", "LB_EJECTION_DURATION", "30")),
+            max_ejection_percent=float(service_env(service_name, "LB_MAX_EJECTION_PERCENT", "LB_MAX_EJECTION_PERCENT", "50")),
+            ewma_decay=float(service_env(service_name, "LB_EWMA_DECAY", "LB_EWMA_DECAY", "10")),
+        )
+
+    @property
+    def primary(self) -> str:
+        return self.replicas[0].url
+
+    def choose(self) -> Replica:
+        if len(self.replicas) == 1:
+            return self.replicas[0]
+        now = time.monotonic()
+        candidates = [r for r in self.replicas if not r.ejected(now)] or self.replicas
+        if self.strategy == EWMA:
+            key = Replica.score
+        else:
+            key = lambda r: r.in_flight  # noqa: E731
+        best = min(key(r) for r in candidates)
+        return self.random.choice([r for r in candidates if key(r) == best])
+
+    def begin(self, replica: Replica):
+        replica.in_flight += 1
+        replica.requests += 1
+
+    def end(self, replica: Replica, latency: float, ok: bool):
+        replica.in_flight -= 1
+        now = time.monotonic()
+        if replica.last_update:
+            alpha = 1 - math.exp(-(now - replica.last_update) / self.ewma_decay)
+            replica.ewma += alpha * (latency - replica.ewma)
+        else:
+            replica.ewma = latency
+        replica.last_update = now
+        if ok:
+            replica.consecutive_failures = 0
+            return
+        replica.errors += 1
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.ejection_threshold and not replica.ejected(now):
+            self._eject(replica, now)
+
+    def abandon(self, replica: Replica):
+        """End a request that was cancelled without an outcome, leaving latency and failure stats alone."""
+        replica.in_flight -= 1
+
+    def _eject(self, replica: Replica, now: float):
+        ejected = sum(1 for r in self.replicas if r.ejected(now))
+        if (ejected + 1) * 100 > self.max_ejection_percent * len(self.replicas):
+            return
+        replica.times_ejected += 1
+        duration = min(self.ejection_duration * replica.times_ejected, self.max_ejection_duration)
+        replica.ejected_until = now + duration
+        replica.consecutive_failures = 0
+        logger.warning("Ejecting %s replica %s for %.0fs", self.service_name, replica.url, duration)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "url": r.url,
+                "healthy": not r.ejected(now),
+                "in_flight": r.in_flight,
+                "ewma_ms": round(r.ewma * 1000, 3),
+                "requests": r.requests,
+                "errors": r.errors,
+                "times_ejected": r.times_ejected,
+                "ejected_for": round(max(r.ejected_until - now, 0.0), 3),
+            }
+            for r in self.replicas
+        ]
@@ -1,30 +1,98 @@
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
 import asyncio
+import hmac
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+import math
 import os
+import threading
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+from access_log import AccessLogMiddleware, setup_logging
+from admission import AdmissionController, AdmissionMiddleware, parse_priority_rules
+from batch import ndjson_lines, parse_concurrency, parse_deadline, parse_items, run_batch
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from compression import CompressionPolicy
+from fallbacks import FallbackRegistry
+from health_prober import HealthProber
+from last_known_good import REVALIDATION_FAILED_WARNING, STALE_WARNING, LastKnownGoodStore, StoredResponse
+from load_balancer import ReplicaSet, parse_replicas, route_to
+from metrics import DEADLINES_EXCEEDED, FALLBACKS, UPSTREAM_CONNECT_ERRORS, UPSTREAM_DURATION, UPSTREAM_HEDGES, UPSTREAM_RETRIES, UPSTREAM_TIMEOUTS, MetricsMiddleware, record_phase, registry as metrics_registry, timed_phase
+from profiler import SamplingProfiler
+from response_cache import CacheEntry, ResponseCache, parse_ttl_rules
+from retries import HedgePolicy, LatencyWindow, RetryBudget, backoff_delay, clone_request, is_replayable, race
+from settings import env_bool, service_env
+from shaping import JsonShaper, ShapingPolicy
+from single_flight import SingleFlight
+from streaming import StreamSlots, bounded_stream, is_event_stream, wants_event_stream
+from timeouts import DeadlineExceeded, TimeoutPolicy
+from upstream_pool import UpstreamPool
+from websocket_proxy import WebSocketProxy, websocket_url
+
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
+log_pipeline = setup_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    fmt=os.getenv("LOG_FORMAT", "json"),
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    repeat_window=float(os.getenv("LOG_REPEAT_WINDOW", "10")),
+    repeat_burst=int(os.getenv("LOG_REPEAT_BURST", "5")),
+    path=os.getenv("LOG_FILE") or None,
+)
 logger = logging.getLogger(__name__)
 
+upstream_pools: Dict[str, UpstreamPool] = {}
+health_prober: Optional[HealthProber] = None
+fallback_registry = FallbackRegistry()
+
+async def register_fallbacks():
+    fallback_registry.register("sis", "GET", "students", await get_students())
+    fallback_registry.register("lms", "GET", "courses", await get_courses())
+    fallback_registry.register("erp", "GET", "employees", await get_employees())
+    fallback_registry.register("exams", "GET", "exams", await get_exams())
+    fallback_registry.register("analytics", "GET", "dashboards", await get_dashboards())
+    fallback_registry.register("ai", "GET", "chat-sessions", await get_chat_sessions())
+    fallback_registry.register("bpm", "GET", "workflows", await get_workflows())
+    fallback_registry.register("admin", "GET", "tenants", await get_tenants())
+    fallback_dir = os.getenv("FALLBACK_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fallback_data"))
+    loaded = fallback_registry.load_directory(fallback_dir)
+    if loaded:
+        logger.info("Loaded %d fallbacks from %s", loaded, fallback_dir)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global health_prober
+    await register_fallbacks()
+    loaded = await last_known_good.load()
+    if loaded:
+        logger.info("Loaded %d last-known-good responses from %s", loaded, last_known_good.path)
+    last_known_good.start()
+    for service_name, replica_set in replica_sets.items():
+        upstream_pools[service_name] = UpstreamPool.from_env(service_name, replica_set.primary)
+    health_prober = HealthProber(
+        SERVICE_REPLICAS,
+        upstream_pools,
+        interval=float(os.getenv("HEALTH_PROBE_INTERVAL", "15")),
+        timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT", "2")),
+        history_size=int(os.getenv("HEALTH_PROBE_HISTORY", "60")),
+    )
+    health_prober.start()
+    yield
+    await health_prober.stop()
+    await last_known_good.stop()
+    await asyncio.gather(*(pool.aclose() for pool in upstream_pools.values()))
+    upstream_pools.clear()
+
 app = FastAPI(
     title="Unified Education Platform - Backend Proxy",
     description="Proxy service for the Unified Education Platform backend services",
-    version="1.0.0"
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 SERVICES = {
@@ -39,87 +107,691 @@ SERVICES = {
     "integration": os.getenv("INTEGRATION_SERVICE_URL", "http://localhost:5009"),
 }
 
+# A service URL may list several replicas separated by commas.
+SERVICE_REPLICAS = {service_name: parse_replicas(service_url) for service_name, service_url in SERVICES.items()}
+replica_sets = {service_name: ReplicaSet.from_env(service_name, urls) for service_name, urls in SERVICE_REPLICAS.items()}
+
+admission = AdmissionController(
+    SERVICES,
+    tenant_header=os.getenv("TENANT_HEADER", "x-tenant-id"),
+    tenant_rate=float(os.getenv("TENANT_RATE_LIMIT", "0")),
+    tenant_burst=float(os.getenv("TENANT_RATE_BURST", "0")),
+    tenant_concurrency=int(os.getenv("TENANT_MAX_CONCURRENCY", "0")),
+    tenant_overrides=parse_ttl_rules(os.getenv("TENANT_RATE_LIMITS", "")),
+    priority_rules=parse_priority_rules(os.getenv("ADMISSION_PRIORITIES", "")),
+    queue_size=int(os.getenv("ADMISSION_QUEUE_SIZE", "50")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "500")) / 1000,
+    low_priority_queue_share=float(os.getenv("ADMISSION_LOW_PRIORITY_QUEUE_SHARE", "0.5")),
+    shed_retry_after=float(os.getenv("ADMISSION_RETRY_AFTER", "1")),
+)
+
+# Admission runs inside CORS so shed responses stay readable by browsers, and inside metrics so they are counted.
+app.add_middleware(AdmissionMiddleware, controller=admission)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(
+    AccessLogMiddleware,
+    services=SERVICES,
+    sample_rate=float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1")),
+    error_sample_rate=float(os.getenv("ACCESS_LOG_ERROR_SAMPLE_RATE", "1")),
+    enabled=env_bool(os.getenv("ACCESS_LOG_ENABLED", "true")),
+)
+SERVER_TIMING_ENABLED = env_bool(os.getenv("SERVER_TIMING_ENABLED", "true"))
+app.add_middleware(MetricsMiddleware, services=SERVICES, server_timing=SERVER_TIMING_ENABLED)
+
+timeouts = TimeoutPolicy(
+    SERVICES,
+    parse_ttl_rules(os.getenv("UPSTREAM_TIMEOUTS", "")),
+    adaptive=env_bool(os.getenv("ADAPTIVE_TIMEOUTS", "false")),
+    percentile=float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", "99")),
+    multiplier=float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "3")),
+    min_timeout=float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "0.5")),
+    max_timeout=float(os.getenv("ADAPTIVE_TIMEOUT_MAX", "60")),
+    window_size=int(os.getenv("UPSTREAM_LATENCY_WINDOW", "500")),
+    deadline_header=os.getenv("DEADLINE_HEADER", "x-request-deadline-ms"),
+    min_budget=float(os.getenv("DEADLINE_MIN_BUDGET_MS", "10")) / 1000,
+    max_budget=float(os.getenv("DEADLINE_MAX_BUDGET_MS", "3600000")) / 1000,
+)
+
+PROXY_STREAMING = os.getenv("PROXY_STREAMING", "true").lower() == "true"
+STREAM_CHUNK_SIZE = int(os.getenv("PROXY_STREAM_CHUNK_SIZE", "65536"))
+STREAM_BUFFER_CHUNKS = int(os.getenv("PROXY_STREAM_BUFFER_CHUNKS", "4"))
+
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+def proxy_response_headers(response: httpx.Response) -> Dict[str, str]:
+    return {k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+SSE_IDLE_TIMEOUT = float(os.getenv("SSE_IDLE_TIMEOUT", "300"))
+sse_slots = StreamSlots({service_name: int(service_env(service_name, "SSE_MAX_CONNECTIONS", "SSE_MAX_CONNECTIONS", "1000")) for service_name in SERVICES})
+
+async def stream_upstream_body(response: httpx.Response, prefix: Optional[List[bytes]] = None, rest: Optional[AsyncIterator[bytes]] = None):
+    # Event streams are relayed as soon as bytes arrive; re-chunking would hold events back.
+    chunk_size = None if is_event_stream(response.headers.get("content-type", "")) else STREAM_CHUNK_SIZE
+    try:
+        for chunk in prefix or ():
+            yield chunk
+        async for chunk in bounded_stream(rest or response.aiter_raw(chunk_size), STREAM_BUFFER_CHUNKS):
+            yield chunk
+    finally:
+        await response.aclose()
+
+compression = CompressionPolicy(
+    enabled=env_bool(os.getenv("COMPRESSION_ENABLED", "true")),
+    min_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+)
+
+shaping = ShapingPolicy(
+    SERVICES,
+    enabled=env_bool(os.getenv("FIELD_PROJECTION_ENABLED", "true")),
+    decodable=compression.decodable,
+)
+
+def streaming_response(
+    response: httpx.Response,
+    request: Request,
+    headers: Optional[Dict[str, str]] = None,
+    remember_key: Optional[str] = None,
+    service_name: Optional[str] = None,
+    prefix: Optional[List[bytes]] = None,
+    rest: Optional[AsyncIterator[bytes]] = None,
+) -> StreamingResponse:
+    headers = headers or proxy_response_headers(response)
+    chunks = stream_upstream_body(response, prefix, rest)
+    if service_name is not None and is_event_stream(response.headers.get("content-type", "")):
+        chunks = sse_slots.hold(service_name, chunks)
+        headers["cache-control"] = "no-cache"
+        headers["x-accel-buffering"] = "no"
+    elif remember_key is not None and is_last_known_good(response):
+        chunks = last_known_good.tee(remember_key, response.status_code, dict(headers), chunks)
+    headers, chunks = compression.negotiate_stream(request.headers.get("accept-encoding", ""), headers, chunks)
+    return StreamingResponse(
+        chunks,
+        status_code=response.status_code,
+        headers=headers,
+        media_type=response.headers.get("content-type")
+    )
+
+def body_response(request: Request, status_code: int, headers: Dict[str, str], body: bytes) -> Response:
+    headers, body = compression.negotiate_body(request.headers.get("accept-encoding", ""), headers, body)
+    return Response(content=body, status_code=status_code, headers=headers)
+
+response_cache = ResponseCache(
+    parse_ttl_rules(os.getenv("RESPONSE_CACHE_TTLS", "")),
+    default_ttl=float(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", "0")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_entry_bytes=int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024))),
+    vary_headers=os.getenv("RESPONSE_CACHE_VARY_HEADERS", "authorization,x-tenant-id,accept,accept-encoding").split(","),
+    stale_while_revalidate=float(os.getenv("RESPONSE_CACHE_STALE_WHILE_REVALIDATE", "0")),
+)
+
+last_known_good = LastKnownGoodStore(
+    max_bytes=int(os.getenv("LAST_KNOWN_GOOD_MAX_BYTES", str(32 * 1024 * 1024))),
+    max_entry_bytes=int(os.getenv("LAST_KNOWN_GOOD_MAX_ENTRY_BYTES", str(1024 * 1024))),
+    max_age=float(os.getenv("LAST_KNOWN_GOOD_MAX_AGE", "86400")),
+    path=os.getenv("LAST_KNOWN_GOOD_PATH", ""),
+    flush_interval=float(os.getenv("LAST_KNOWN_GOOD_FLUSH_INTERVAL", "5")),
+)
+LAST_KNOWN_GOOD_ENABLED = env_bool(os.getenv("LAST_KNOWN_GOOD_ENABLED", "true"))
+
+def is_last_known_good(response: httpx.Response) -> bool:
+    return response.status_code == 200 and "no-store" not in response.headers.get("cache-control", "")
+
+def remember(remember_key: Optional[str], response: httpx.Response, headers: Dict[str, str], body: bytes):
+    if remember_key is not None and is_last_known_good(response):
+        last_known_good.put(remember_key, response.status_code, headers, body)
+
+def stale_response(entry: StoredResponse, request: Request, warning: str) -> Response:
+    headers = dict(entry.headers)
+    headers["age"] = str(entry.age)
+    headers["warning"] = warning
+    headers["x-fallback"] = "last-known-good"
+    return body_response(request, entry.status_code, headers, entry.body)
+
+def cached_response(entry: CacheEntry, request: Request, cache_status: str) -> Response:
+    headers = dict(entry.headers)
+    headers["age"] = str(entry.age)
+    headers["x-cache"] = cache_status
+    if cache_status == "STALE":
+        headers["warning"] = STALE_WARNING
+    if entry.etag and request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers={"etag": entry.etag, "age": headers["age"], "x-cache": cache_status})
+    return body_response(request, entry.status_code, headers, entry.body)
+
+async def read_upstream_body(response: httpx.Response) -> bytes:
+    try:
+        with timed_phase("read"):
+            return b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+
+async def read_upstream_prefix(response: httpx.Response, limit: int) -> Tuple[List[bytes], Optional[AsyncIterator[bytes]]]:
+    """Buffer at most limit bytes of a body of unknown length; the iterator is returned when more remains."""
+    chunks, size = [], 0
+    raw = response.aiter_raw(STREAM_CHUNK_SIZE)
+    try:
+        with timed_phase("read"):
+            async for chunk in raw:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > limit:
+                    return chunks, raw
+    except BaseException:
+        await response.aclose()
+        raise
+    await response.aclose()
+    return chunks, None
+
+circuit_breakers = {service_name: CircuitBreaker.from_env(service_name) for service_name in SERVICES}
+BREAKER_FAILURE_STATUSES = {502, 503, 504}
+
+async def send_upstream(service_name: str, upstream_request: httpx.Request, stream: bool, deadline: Optional[float] = None) -> httpx.Response:
+    """One attempt against one replica; outcomes feed that replica's load-balancing and ejection stats."""
+    timeouts.apply_deadline(service_name, upstream_request, deadline)
+    replica_set = replica_sets[service_name]
+    replica = replica_set.choose()
+    route_to(upstream_request, replica.url)
+    replica_set.begin(replica)
+    started = time.perf_counter()
+    ok = None
+    try:
+        response = await upstream_pools[service_name].send(upstream_request, stream=stream)
+        ok = response.status_code not in BREAKER_FAILURE_STATUSES
+    except httpx.TransportError as e:
+        # Includes read/write errors and protocol errors from a replica resetting mid-response.
+        ok = False
+        if isinstance(e, httpx.TimeoutException):
+            UPSTREAM_TIMEOUTS.inc((service_name,))
+        elif isinstance(e, httpx.ConnectError):
+            UPSTREAM_CONNECT_ERRORS.inc((service_name,))
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if ok is None:
+            # Cancelled (typically the losing side of a hedge): its latency says nothing about the replica.
+            replica_set.abandon(replica)
+        else:
+            replica_set.end(replica, elapsed, ok=ok)
+            UPSTREAM_DURATION.observe((service_name, upstream_request.method), elapsed)
+    if ok:
+        upstream_latencies[service_name].observe(elapsed)
+        timeouts.observe(service_name, upstream_request.url.path.removeprefix("/api/"), elapsed)
+    return response
+
+RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("UPSTREAM_RETRY_BACKOFF_BASE", "0.05"))
+RETRY_BACKOFF_CAP = float(os.getenv("UPSTREAM_RETRY_BACKOFF_CAP", "1.0"))
+retry_budgets = {service_name: RetryBudget.from_env(service_name) for service_name in SERVICES}
+upstream_latencies = {service_name: LatencyWindow(int(os.getenv("UPSTREAM_LATENCY_WINDOW", "500"))) for service_name in SERVICES}
+hedging = HedgePolicy(
+    os.getenv("HEDGE_ROUTES", "").split(","),
+    percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+    min_delay=float(os.getenv("HEDGE_MIN_DELAY_MS", "5")) / 1000,
+)
+
+async def send_with_retries(service_name: str, upstream_request: httpx.Request, stream: bool, deadline: Optional[float] = None) -> httpx.Response:
+    # A connect error means the request never reached the upstream, so any method may be retried.
+    attempt = 0
+    while True:
+        try:
+            return await send_upstream(service_name, upstream_request, stream, deadline)
+        except httpx.ConnectError:
+            if attempt >= RETRY_ATTEMPTS or not is_replayable(upstream_request):
+                raise
+            delay = backoff_delay(attempt + 1, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+            if (deadline is not None and timeouts.expired(deadline - delay)) or not retry_budgets[service_name].try_withdraw():
+                raise
+            attempt += 1
+            UPSTREAM_RETRIES.inc((service_name,))
+            await asyncio.sleep(delay)
+
+async def call_upstream(service_name: str, upstream_request: httpx.Request, stream: bool = True, hedge: bool = False, deadline: Optional[float] = None) -> httpx.Response:
+    # The breaker sees one outcome per logical request, after retries and hedging: retried
+    # attempts are not counted twice, and a request rescued by another replica counts as a success.
+    # Individual bad replicas are handled by outlier ejection in send_upstream.
+    breaker = circuit_breakers[service_name]
+    breaker.before_request()
+    try:
+        response = await _call_upstream(service_name, upstream_request, stream, hedge, deadline)
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    if response.status_code in BREAKER_FAILURE_STATUSES:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+async def _call_upstream(service_name: str, upstream_request: httpx.Request, stream: bool, hedge: bool, deadline: Optional[float]) -> httpx.Response:
+    retry_budgets[service_name].record_request()
+    started = time.perf_counter()
+    try:
+        delay = hedging.delay(upstream_latencies[service_name]) if hedge and is_replayable(upstream_request) else None
+        if delay is None:
+            return await send_with_retries(service_name, upstream_request, stream, deadline)
+        response, hedged, hedge_won = await race(
+            lambda: send_with_retries(service_name, upstream_request, stream, deadline),
+            lambda: send_upstream(service_name, clone_request(upstream_request), stream, deadline),
+            delay,
+            retry_budgets[service_name].try_withdraw,
+            lambda response: response.status_code not in BREAKER_FAILURE_STATUSES,
+            lambda response: response.aclose(),
+        )
+        if hedged:
+            UPSTREAM_HEDGES.inc((service_name, "sent"))
+        if hedge_won:
+            UPSTREAM_HEDGES.inc((service_name, "won"))
+        return response
+    finally:
+        record_phase("upstream", time.perf_counter() - started)
+
+async def fetch_buffered(service_name: str, upstream_request: httpx.Request, accept_encoding: str, hedge: bool = False, shaper: Optional[JsonShaper] = None, deadline: Optional[float] = None):
+    response = shaping.shape_response(await call_upstream(service_name, upstream_request, hedge=hedge, deadline=deadline), shaper)
+    body = await read_upstream_body(response)
+    headers, body = compression.negotiate_body(accept_encoding, proxy_response_headers(response), body)
+    return response, headers, body
+
+async def cache_upstream_response(cache_key: str, cache_ttl: float, cache_entry: Optional[CacheEntry], response: httpx.Response, request: Request, buffered: Optional[tuple] = None) -> Response:
+    if response.status_code == 304 and cache_entry is not None:
+        await response.aclose()
+        response_cache.revalidated(cache_key, cache_ttl)
+        return cached_response(cache_entry, request, "REVALIDATED")
+    
+    cacheable = response.status_code == 200 and "no-store" not in response.headers.get("cache-control", "")
+    if buffered is None:
+        content_length = response.headers.get("content-length")
+        if not cacheable or (content_length is not None and int(content_length) > response_cache.max_entry_bytes):
+            headers = proxy_response_headers(response)
+            headers["x-cache"] = "MISS"
+            return streaming_response(response, request, headers, cache_key if LAST_KNOWN_GOOD_ENABLED else None)
+        if content_length is None:
+            # Chunked bodies (including shaped ones) are cached when they turn out small enough.
+            prefix, rest = await read_upstream_prefix(response, response_cache.max_entry_bytes)
+            if rest is not None:
+                headers = proxy_response_headers(response)
+                headers["x-cache"] = "MISS"
+                return streaming_response(response, request, headers, cache_key if LAST_KNOWN_GOOD_ENABLED else None, prefix=prefix, rest=rest)
+            body = b"".join(prefix)
+        else:
+            body = await read_upstream_body(response)
+        headers, body = compression.negotiate_body(request.headers.get("accept-encoding", ""), proxy_response_headers(response), body)
+    else:
+        headers, body = buffered
+    
+    if cacheable:
+        # Store the negotiated representation so hits are served without recompressing.
+        response_cache.put(cache_key, CacheEntry(response.status_code, dict(headers), body, cache_ttl))
+    remember(cache_key if LAST_KNOWN_GOOD_ENABLED else None, response, headers, body)
+    return Response(content=body, status_code=response.status_code, headers={**headers, "x-cache": "MISS"})
+
+revalidating: Dict[str, asyncio.Task] = {}
+
+async def refresh_cache_entry(service_name: str, path: str, request: Request, cache_key: str, cache_ttl: float, cache_entry: CacheEntry):
+    headers = {k: v for k, v in request.headers.items() if k not in ("host", "if-none-match", "if-modified-since", timeouts.deadline_header)}
+    if cache_entry.etag:
+        headers["if-none-match"] = cache_entry.etag
+    upstream_request = upstream_pools[service_name].client.build_request(
+        "GET", f"{replica_sets[service_name].primary}/api/{path}", headers=headers,
+        params=shaping.upstream_params(service_name, dict(request.query_params)), timeout=timeouts.timeout_for(service_name, path)[0]
+    )
+    try:
+        response = shaping.shape_response(await call_upstream(service_name, upstream_request), shaping.shaper_for(service_name, request.query_params))
+        if response.status_code == 304:
+            await response.aclose()
+            response_cache.revalidated(cache_key, cache_ttl)
+            return
+        body = await read_upstream_body(response)
+        if response.status_code == 200 and "no-store" not in response.headers.get("cache-control", ""):
+            headers, body = compression.negotiate_body(request.headers.get("accept-encoding", ""), proxy_response_headers(response), body)
+            response_cache.put(cache_key, CacheEntry(response.status_code, dict(headers), body, cache_ttl))
+            remember(cache_key if LAST_KNOWN_GOOD_ENABLED else None, response, headers, body)
+    except Exception as e:
+        logger.info("Background revalidation of %s/%s failed: %s", service_name, path, e)
+
+def revalidate_in_background(service_name: str, path: str, request: Request, cache_key: str, cache_ttl: float, cache_entry: CacheEntry):
+    if cache_key in revalidating:
+        return
+    task = asyncio.create_task(refresh_cache_entry(service_name, path, request, cache_key, cache_ttl, cache_entry))
+    revalidating[cache_key] = task
+    task.add_done_callback(lambda _: revalidating.pop(cache_key, None))
+
+single_flight = SingleFlight(os.getenv("COALESCE_ROUTES", "").split(","))
+
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+def collect_proxy_state():
+    yield (
+        "proxy_circuit_breaker_state", "gauge", "Circuit breaker state (0=closed, 1=half_open, 2=open).",
+        [({"service": name}, BREAKER_STATE_VALUES[breaker.state]) for name, breaker in circuit_breakers.items()],
+    )
+    pool_samples = []
+    for name, pool in upstream_pools.items():
+        stats = pool.stats()
+        pool_samples += [({"service": name, "state": state}, stats[state]) for state in ("open", "idle", "in_use")]
+    yield ("proxy_upstream_connections", "gauge", "Upstream pool connections by state.", pool_samples)
+    replica_stats = [(name, replica) for name, replica_set in replica_sets.items() for replica in replica_set.stats()]
+    yield (
+        "proxy_upstream_replica_healthy", "gauge", "Whether a replica is in rotation (0 while ejected).",
+        [({"service": name, "replica": replica["url"]}, int(replica["healthy"])) for name, replica in replica_stats],
+    )
+    yield (
+        "proxy_upstream_replica_in_flight", "gauge", "Requests currently outstanding per replica.",
+        [({"service": name, "replica": replica["url"]}, replica["in_flight"]) for name, replica in replica_stats],
+    )
+    cache_stats = response_cache.stats()
+    yield (
+        "proxy_cache_events_total", "counter", "Response cache lookups and evictions.",
+        [({"event": event}, cache_stats[key]) for event, key in (("hit", "hits"), ("miss", "misses"), ("revalidation", "revalidations"), ("eviction", "evictions"))],
+    )
+    yield ("proxy_cache_size_bytes", "gauge", "Bytes held by the response cache.", [({}, cache_stats["size_bytes"])])
+    yield (
+        "proxy_compression_total", "counter", "Proxied bodies by encoding action.",
+        [({"action": action}, getattr(compression, action)) for action in ("passthrough", "compressed", "decoded")],
+    )
+    yield (
+        "proxy_retry_budget_exhausted_total", "counter", "Retries and hedges skipped because the service's retry budget was spent.",
+        [({"service": name}, budget.exhausted) for name, budget in retry_budgets.items()],
+    )
+    limiters = [(name, limiter.stats()) for name, limiter in admission.service_limiters.items()]
+    yield ("proxy_admission_active", "gauge", "Requests holding a service concurrency slot.", [({"service": name}, stats["active"]) for name, stats in limiters])
+    yield ("proxy_admission_queued", "gauge", "Requests waiting for a service concurrency slot.", [({"service": name}, stats["queued"]) for name, stats in limiters])
+    lkg_stats = last_known_good.stats()
+    yield ("proxy_last_known_good_entries", "gauge", "Responses held by the last-known-good store.", [({}, lkg_stats["entries"])])
+    yield ("proxy_last_known_good_size_bytes", "gauge", "Bytes held by the last-known-good store.", [({}, lkg_stats["size_bytes"])])
+    yield (
+        "proxy_stream_connections", "gauge", "Open long-lived streams by kind.",
+        [({"service": name, "kind": "sse"}, count) for name, count in sse_slots.active.items()]
+        + [({"service": name, "kind": "websocket"}, count) for name, count in websocket_proxy.active.items()],
+    )
+    log_stats = log_pipeline.stats()
+    yield (
+        "proxy_log_records_dropped_total", "counter", "Log records not written, by reason.",
+        [({"reason": "queue_full"}, log_stats["dropped"]), ({"reason": "repeated"}, log_stats["suppressed"])],
+    )
+    yield ("proxy_shaped_responses_total", "counter", "List responses rewritten by field projection or the page-size cap.", [({}, shaping.shaped)])
+    yield ("proxy_coalesced_requests_total", "counter", "Requests served from another request's upstream call.", [({}, single_flight.coalesced)])
+
+metrics_registry.add_collector(collect_proxy_state)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "backend-proxy"}
 
 @app.get("/api/status")
-async def get_service_status():
-    status = {}
-    async with httpx.AsyncClient() as client:
-        for service_name, service_url in SERVICES.items():
-            try:
-                response = await client.get(f"{service_url}/health", timeout=5.0)
-                status[service_name] = {
-                    "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "url": service_url,
-                    "response_time": response.elapsed.total_seconds()
-                }
-            except Exception as e:
-                status[service_name] = {
-                    "status": "unavailable",
-                    "url": service_url,
-                    "error": str(e)
-                }
-    return status
+async def get_service_status(fresh: bool = False):
+    snapshot = await health_prober.probe_all() if fresh else health_prober.snapshot
+    return {
+        service_name: {
+            **status,
+            "circuit_breaker": circuit_breakers[service_name].snapshot(),
+            "load_balancer": {"strategy": replica_sets[service_name].strategy, "replicas": replica_sets[service_name].stats()},
+            "retry_budget": retry_budgets[service_name].stats(),
+        }
+        for service_name, status in snapshot.items()
+    }
+
+@app.get("/api/pools")
+async def get_pool_stats():
+    return {service_name: pool.stats() for service_name, pool in upstream_pools.items()}
+
+@app.get("/api/cache")
+async def get_cache_stats():
+    return response_cache.stats()
+
+@app.get("/api/coalescing")
+async def get_coalescing_stats():
+    return single_flight.stats()
+
+@app.get("/api/timeouts")
+async def get_timeout_stats():
+    return timeouts.stats()
+
+@app.get("/api/admission")
+async def get_admission_stats():
+    return admission.stats()
+
+profiler = SamplingProfiler(max_seconds=float(os.getenv("PROFILER_MAX_SECONDS", "60")))
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+
+@app.get("/api/profile")
+async def run_profiler(request: Request, seconds: float = 10, interval_ms: float = 5):
+    # Hidden unless a token is configured; sampling only happens while a request is running.
+    if not PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", "").encode(), PROFILER_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not (math.isfinite(seconds) and math.isfinite(interval_ms)):
+        raise HTTPException(status_code=400, detail="seconds and interval_ms must be finite numbers")
+    try:
+        stacks = await asyncio.to_thread(profiler.run, threading.get_ident(), seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(content=profiler.render(stacks), media_type="text/plain")
+
+@app.get("/api/shaping")
+async def get_shaping_stats():
+    return shaping.stats()
+
+@app.get("/api/fallbacks")
+async def get_fallback_stats():
+    return {**fallback_registry.stats(), "last_known_good": last_known_good.stats()}
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "10"))
+BATCH_DEFAULT_DEADLINE = float(os.getenv("BATCH_DEFAULT_DEADLINE", "10"))
+
+@app.post("/api/batch")
+async def batch_requests(request: Request, stream: bool = False):
+    try:
+        payload = await request.json()
+        items = parse_items(payload.get("requests"), BATCH_MAX_REQUESTS)
+        concurrency = parse_concurrency(payload.get("concurrency"), BATCH_MAX_CONCURRENCY)
+        deadline = parse_deadline(payload.get("deadline_ms"), BATCH_DEFAULT_DEADLINE, BATCH_DEFAULT_DEADLINE)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    results = run_batch(request, items, proxy_request, SERVICES, concurrency, deadline, admission)
+    if stream or payload.get("stream"):
+        return StreamingResponse(ndjson_lines(results), media_type="application/x-ndjson")
+    responses = [result async for result in results]
+    responses.sort(key=lambda result: result["index"])
+    return {"responses": responses}
+
+websocket_proxy = WebSocketProxy(
+    SERVICES,
+    idle_timeout=float(os.getenv("WEBSOCKET_IDLE_TIMEOUT", "300")),
+    connect_timeout=float(os.getenv("WEBSOCKET_CONNECT_TIMEOUT", "5")),
+    max_message_bytes=int(os.getenv("WEBSOCKET_MAX_MESSAGE_BYTES", str(1024 * 1024))),
+    max_queue=int(os.getenv("WEBSOCKET_MAX_QUEUE", "16")),
+)
+
+@app.get("/api/streams")
+async def get_stream_stats():
+    return {"sse": sse_slots.stats(), "websocket": websocket_proxy.stats()}
+
+@app.websocket("/api/{service_name}/{path:path}")
+async def proxy_websocket(websocket: WebSocket, service_name: str, path: str):
+    if service_name not in SERVICES:
+        await websocket.close(code=1008)
+        return
+    # Admission (rate limits, not concurrency) ran in AdmissionMiddleware; the breaker and the replica's
+    # stats see the upstream handshake only, since a long-lived connection says nothing about latency.
+    breaker = circuit_breakers[service_name]
+    try:
+        breaker.before_request()
+    except CircuitOpenError:
+        await websocket.close(code=1013)
+        return
+    replica_set = replica_sets[service_name]
+    replica = replica_set.choose()
+    replica_set.begin(replica)
+    reported = False
+
+    def connected(ok: bool, elapsed: float):
+        nonlocal reported
+        reported = True
+        replica_set.end(replica, elapsed, ok=ok)
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    query = websocket.url.query
+    upstream_url = f"{websocket_url(replica.url)}/api/{path}" + (f"?{query}" if query else "")
+    try:
+        await websocket_proxy.proxy(websocket, service_name, upstream_url, connected)
+    finally:
+        if not reported:
+            replica_set.abandon(replica)
 
 @app.api_route("/api/{service_name}/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def proxy_request(service_name: str, path: str, request: Request):
     if service_name not in SERVICES:
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
     
-    service_url = SERVICES[service_name]
+    service_url = replica_sets[service_name].primary
     target_url = f"{service_url}/api/{path}"
     
+    cache_key = None
+    cache_entry = None
+    remember_key = None
+    event_stream = wants_event_stream(request.headers.get("accept", ""))
+    cache_ttl = response_cache.ttl_for(service_name, path) if request.method == "GET" and not event_stream else 0
+    if cache_ttl > 0:
+        cache_key = response_cache.key_for(service_name, path, request.query_params.multi_items(), request.headers)
+        cache_entry = response_cache.get(cache_key)
+        if cache_entry is not None and cache_entry.fresh:
+            return cached_response(cache_entry, request, "HIT")
+        if cache_entry is not None and response_cache.servable_stale(cache_entry):
+            revalidate_in_background(service_name, path, request, cache_key, cache_ttl, cache_entry)
+            return cached_response(cache_entry, request, "STALE")
+    shaper = shaping.shaper_for(service_name, request.query_params) if request.method == "GET" and not event_stream else None
+    if request.method == "GET" and LAST_KNOWN_GOOD_ENABLED and not event_stream:
+        remember_key = cache_key or response_cache.key_for(service_name, path, request.query_params.multi_items(), request.headers)
+    
+    deadline = timeouts.deadline_from(request.headers)
+    if timeouts.expired(deadline):
+        DEADLINES_EXCEEDED.inc((service_name,))
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
+    
     body = None
     if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            body = await request.body()
-        except Exception:
-            body = None
+        if PROXY_STREAMING:
+            body = bounded_stream(request.stream(), STREAM_BUFFER_CHUNKS)
+        else:
+            try:
+                body = await request.body()
+            except Exception:
+                body = None
     
     headers = dict(request.headers)
     headers.pop("host", None)
+    # Re-added per attempt with whatever budget is left when the upstream call is made.
+    headers.pop(timeouts.deadline_header, None)
+    coalesce_key = None
+    if request.method == "GET" and not event_stream and single_flight.enabled_for(service_name, path):
+        coalesce_key = remember_key or response_cache.key_for(service_name, path, request.query_params.multi_items(), request.headers)
+        # A shared upstream reply must not depend on one caller's conditional headers.
+        headers.pop("if-none-match", None)
+        headers.pop("if-modified-since", None)
+    if cache_entry is not None and cache_entry.etag:
+        headers["if-none-match"] = cache_entry.etag
+    
+    timeout = timeouts.timeout_for(service_name, path)[0]
+    if event_stream:
+        # The route timeout bounds connecting and the first byte; between events only the idle timeout applies.
+        timeout = httpx.Timeout(timeout, read=SSE_IDLE_TIMEOUT)
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=headers,
-                content=body,
-                params=dict(request.query_params),
-                timeout=5.0
-            )
-            
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.headers.get("content-type")
+        pool = upstream_pools[service_name]
+        upstream_request = pool.client.build_request(
+            method=request.method,
+            url=target_url,
+            headers=headers,
+            content=body,
+            params=shaping.upstream_params(service_name, dict(request.query_params)),
+            timeout=timeout
+        )
+        buffered = None
+        hedge = not event_stream and hedging.enabled_for(service_name, path, request.method)
+        if coalesce_key is not None:
+            accept_encoding = request.headers.get("accept-encoding", "")
+            # The shared upstream call runs under the leader's deadline; each follower stops waiting at its own.
+            flight = single_flight.do(
+                coalesce_key, lambda: fetch_buffered(service_name, upstream_request, accept_encoding, hedge, shaper, deadline)
             )
-    except (httpx.TimeoutException, httpx.ConnectError):
-        logger.info(f"Service {service_name} unavailable, falling back to mock data for {path}")
-        if service_name == "sis" and path == "students" and request.method == "GET":
-            return await get_students()
-        elif service_name == "lms" and path == "courses" and request.method == "GET":
-            return await get_courses()
-        elif service_name == "erp" and path == "employees" and request.method == "GET":
-            return await get_employees()
-        elif service_name == "exams" and path == "exams" and request.method == "GET":
-            return await get_exams()
-        elif service_name == "analytics" and path == "dashboards" and request.method == "GET":
-            return await get_dashboards()
-        elif service_name == "ai" and path == "chat-sessions" and request.method == "GET":
-            return await get_chat_sessions()
-        elif service_name == "bpm" and path == "workflows" and request.method == "GET":
-            return await get_workflows()
-        elif service_name == "admin" and path == "tenants" and request.method == "GET":
-            return await get_tenants()
+            try:
+                response, response_headers, response_body = await asyncio.wait_for(
+                    flight, None if deadline is None else deadline - time.monotonic()
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(service_name)
+            buffered = (response_headers, response_body)
         else:
-            raise HTTPException(status_code=503, detail="Service unavailable and no mock data available")
+            response = shaping.shape_response(await call_upstream(service_name, upstream_request, hedge=hedge, deadline=deadline), shaper)
+        
+        if remember_key is not None and response.status_code in BREAKER_FAILURE_STATUSES:
+            stale = last_known_good.get(remember_key)
+            if stale is not None:
+                await response.aclose()
+                FALLBACKS.inc((service_name, "last_known_good"))
+                return stale_response(stale, request, f"{STALE_WARNING}, {REVALIDATION_FAILED_WARNING}")
+        
+        if cache_key is not None:
+            return await cache_upstream_response(cache_key, cache_ttl, cache_entry, response, request, buffered)
+        
+        if buffered is not None:
+            remember(remember_key, response, buffered[0], buffered[1])
+            return body_response(request, response.status_code, dict(buffered[0]), buffered[1])
+        
+        if is_event_stream(response.headers.get("content-type", "")):
+            if not sse_slots.try_acquire(service_name):
+                await response.aclose()
+                raise HTTPException(status_code=503, detail="Too many event streams", headers={"Retry-After": "1"})
+            return streaming_response(response, request, service_name=service_name)
+        
+        if PROXY_STREAMING:
+            return streaming_response(response, request, remember_key=remember_key)
+        
+        headers = proxy_response_headers(response)
+        body = await read_upstream_body(response)
+        remember(remember_key, response, headers, body)
+        return body_response(request, response.status_code, headers, body)
+    except HTTPException:
+        raise
+    except DeadlineExceeded:
+        DEADLINES_EXCEEDED.inc((service_name,))
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
+    except (httpx.TimeoutException, httpx.ConnectError, CircuitOpenError) as e:
+        stale = last_known_good.get(remember_key) if remember_key is not None else None
+        if stale is not None:
+            logger.info("Service %s unavailable, serving last known good response for %s", service_name, path)
+            FALLBACKS.inc((service_name, "last_known_good"))
+            return stale_response(stale, request, f"{STALE_WARNING}, {REVALIDATION_FAILED_WARNING}")
+        logger.info("Service %s unavailable, falling back to mock data for %s", service_name, path)
+        fallback = fallback_registry.lookup(service_name, request.method, path)
+        if fallback is not None:
+            FALLBACKS.inc((service_name, "static"))
+            headers = {"content-type": fallback.media_type}
+            return fallback.response(shaping.shape_body(fallback.status_code, headers, fallback.body, shaper))
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if isinstance(e, CircuitOpenError) else None
+        raise HTTPException(status_code=503, detail="Service unavailable and no mock data available", headers=headers)
     except Exception as e:
-        logger.error(f"Error proxying request to {target_url}: {str(e)}")
+        logger.error("Error proxying %s request to %s: %s", service_name, target_url, e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.get("/api/sis/students")
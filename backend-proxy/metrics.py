@@ -0,0 +1,232 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: LabelValues = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+    def set(self, labels: LabelValues, value: float):
+        self.values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count, sum]
+        self.values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, labels: LabelValues, value: float):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> List[str]:
+        lines = []
+        for labels, series in self.values.items():
+            label_dict = dict(zip(self.labelnames, labels))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**label_dict, 'le': _format_value(bound)})} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(label_dict)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(label_dict)} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]):
+        """Add a callback returning (name, kind, help, samples) families, evaluated at scrape time."""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        for collector in self.collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.register(Counter(
+    "proxy_requests_total", "Requests handled by the proxy.", ("service", "method", "status_class")))
+REQUEST_ERRORS = registry.register(Counter(
+    "proxy_request_errors_total", "Requests answered with a 5xx status.", ("service", "method", "status_class")))
+REQUEST_DURATION = registry.register(Histogram(
+    "proxy_request_duration_seconds", "End-to-end request latency including the response body.", ("service", "method", "status_class")))
+UPSTREAM_DURATION = registry.register(Histogram(
+    "proxy_upstream_duration_seconds", "Time spent waiting for upstream response headers.", ("service", "method")))
+OVERHEAD_DURATION = registry.register(Histogram(
+    "proxy_overhead_duration_seconds", "Request latency not spent waiting on the upstream.", ("service", "method")))
+IN_FLIGHT = registry.register(Gauge(
+    "proxy_requests_in_flight", "Requests currently being handled.", ("service",)))
+UPSTREAM_TIMEOUTS = registry.register(Counter(
+    "proxy_upstream_timeouts_total", "Upstream calls that timed out.", ("service",)))
+UPSTREAM_CONNECT_ERRORS = registry.register(Counter(
+    "proxy_upstream_connect_errors_total", "Upstream calls that failed to connect.", ("service",)))
+UPSTREAM_RETRIES = registry.register(Counter(
+    "proxy_upstream_retries_total", "Upstream calls retried after a connect error.", ("service",)))
+UPSTREAM_HEDGES = registry.register(Counter(
+    "proxy_upstream_hedges_total", "Hedged upstream calls sent and won by the hedge.", ("service", "outcome")))
+DEADLINES_EXCEEDED = registry.register(Counter(
+    "proxy_deadline_exceeded_total", "Requests failed fast because the client's deadline had passed.", ("service",)))
+ADMISSION_REJECTED = registry.register(Counter(
+    "proxy_admission_rejected_total", "Requests shed by admission control.", ("service", "reason")))
+FALLBACKS = registry.register(Counter(
+    "proxy_fallbacks_total", "Requests answered from fallback data.", ("service", "kind")))
+
+
+class RequestTiming:
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("current_timing", default=None)
+
+
+def record_phase(phase: str, seconds: float):
+    timing = current_timing.get()
+    if timing is not None:
+        timing.add(phase, seconds)
+
+
+@contextmanager
+def timed_phase(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+def server_timing(phases: Dict[str, float], total: float) -> bytes:
+    entries = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; avoids BaseHTTPMiddleware so it adds no extra task or body copy."""
+
+    def __init__(self, app, services: Iterable[str], server_timing: bool = False):
+        self.app = app
+        self.services = set(services)
+        self.server_timing = server_timing
+
+    def _service(self, path: str) -> str:
+        if path.startswith("/api/"):
+            service_name = path[5:].split("/", 1)[0]
+            if service_name in self.services:
+                return service_name
+        return "proxy"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        service_name = self._service(scope["path"])
+        method = scope["method"]
+        status_code = 500
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        IN_FLIGHT.inc((service_name,))
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    # Phases that finish before the headers go out; streamed body time is only in the metrics.
+                    header = server_timing(timing.phases, time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", ()), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            current_timing.reset(token)
+            IN_FLIGHT.dec((service_name,))
+            status_class = f"{status_code // 100}xx"
+            labels = (service_name, method, status_class)
+            REQUESTS.inc(labels)
+            if status_code >= 500:
+                REQUEST_ERRORS.inc(labels)
+            REQUEST_DURATION.observe(labels, duration)
+            upstream = timing.phases.get("upstream")
+            if upstream is not None:
+                OVERHEAD_DURATION.observe((service_name, method), max(duration - upstream, 0.0))
@@ -0,0 +1,63 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Dict, Optional
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Wall-clock sampler over a thread's Python stack, output in collapsed ("folded") stack format.
+
+    Nothing is installed while idle; a sampling thread only exists for the
+    duration of a ``run`` call, so the proxy pays nothing until asked.
+    """
+
+    def __init__(self, max_seconds: float = 60.0, min_interval: float = 0.001, max_interval: float = 1.0):
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._lock = threading.Lock()
+        self.runs = 0
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, thread_id: int, seconds: float, interval: float = 0.005) -> Dict[str, int]:
+        """Sample thread_id every interval for seconds; blocks the calling thread."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            self.runs += 1
+            seconds = min(max(seconds, 0.0), self.max_seconds)
+            interval = min(max(interval, self.min_interval), self.max_interval)
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    stacks[_collapse(frame)] += 1
+                del frame
+                time.sleep(max(min(interval, deadline - time.monotonic()), 0.0))
+            return dict(stacks)
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def render(stacks: Dict[str, int]) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
@@ -0,0 +1,133 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+
+def parse_ttl_rules(spec: str) -> Dict[str, float]:
+    """Parse "lms/courses=60,admin=300" into {"lms/courses": 60.0, "admin": 300.0}."""
+    rules = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        prefix, ttl = item.split("=", 1)
+        rules[prefix.strip().strip("/")] = float(ttl)
+    return rules
+
+
+class CacheEntry:
+    __slots__ = ("status_code", "headers", "body", "etag", "stored_at", "expires_at", "size")
+
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes, ttl: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = headers.get("etag")
+        self.stored_at = time.monotonic()
+        self.expires_at = self.stored_at + ttl
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers.items())
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+    @property
+    def age(self) -> int:
+        return int(time.monotonic() - self.stored_at)
+
+    def refresh(self, ttl: float):
+        self.stored_at = time.monotonic()
+        self.expires_at = self.stored_at + ttl
+
+
+class ResponseCache:
+    """Byte-bounded LRU cache for idempotent upstream GET responses."""
+
+    def __init__(
+        self,
+        ttl_rules: Dict[str, float],
+        default_ttl: float = 0.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 1024 * 1024,
+        vary_headers: Iterable[str] = ("authorization", "x-tenant-id", "accept", "accept-encoding"),
+        stale_while_revalidate: float = 0.0,
+    ):
+        self.ttl_rules = ttl_rules
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.vary_headers = [h.strip().lower() for h in vary_headers if h.strip()]
+        self.stale_while_revalidate = stale_while_revalidate
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def ttl_for(self, service_name: str, path: str) -> float:
+        route = f"{service_name}/{path.strip('/')}"
+        best, best_len = self.default_ttl, -1
+        for prefix, ttl in self.ttl_rules.items():
+            if (route == prefix or route.startswith(prefix + "/")) and len(prefix) > best_len:
+                best, best_len = ttl, len(prefix)
+        return best
+
+    def key_for(self, service_name: str, path: str, query: List[Tuple[str, str]], headers: Any) -> str:
+        parts = [service_name, path, urlencode(sorted(query))]
+        parts.extend(f"{name}:{headers.get(name, '')}" for name in self.vary_headers)
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        if entry.fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> bool:
+        if entry.size > self.max_entry_bytes:
+            return False
+        self.discard(key)
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+        return True
+
+    def servable_stale(self, entry: CacheEntry) -> bool:
+        """Whether an expired entry may still be served while it is refreshed in the background."""
+        return time.monotonic() < entry.expires_at + self.stale_while_revalidate
+
+    def revalidated(self, key: str, ttl: float) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.refresh(ttl)
+            self.revalidations += 1
+        return entry
+
+    def discard(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from settings import service_env
+
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+
+def is_replayable(request: httpx.Request) -> bool:
+    # Streamed uploads are consumed by the first attempt; only in-memory bodies can be resent.
+    return isinstance(request.stream, httpx.ByteStream)
+
+
+def clone_request(request: httpx.Request) -> httpx.Request:
+    return httpx.Request(request.method, request.url, headers=request.headers.copy(), stream=request.stream, extensions=dict(request.extensions))
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """Caps retries and hedges at a fraction of recent requests, plus a small per-second floor."""
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 5.0, window: int = 10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = max(int(window), 1)
+        self.buckets: deque = deque()
+        self.requests = 0
+        self.retries = 0
+        self.withdrawn = 0
+        self.exhausted = 0
+
+    @classmethod
+    def from_env(cls, service_name: str) -> "RetryBudget":
+        return cls(
+            ratio=float(service_env(service_name, "RETRY_BUDGET_RATIO", "RETRY_BUDGET_RATIO", "0.1")),
+            min_per_second=float(service_env(service_name, "RETRY_BUDGET_MIN_PER_SECOND", "RETRY_BUDGET_MIN_PER_SECOND", "5")),
+            window=int(service_env(service_name, "RETRY_BUDGET_WINDOW", "RETRY_BUDGET_WINDOW", "10")),
+        )
+
+    def _bucket(self) -> List[int]:
+        second = int(time.monotonic())
+        while self.buckets and self.buckets[0][0] <= second - self.window:
+            _, requests, retries = self.buckets.popleft()
+            self.requests -= requests
+            self.retries -= retries
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append([second, 0, 0])
+        return self.buckets[-1]
+
+    def record_request(self):
+        self._bucket()[1] += 1
+        self.requests += 1
+
+    def try_withdraw(self) -> bool:
+        bucket = self._bucket()
+        if self.retries >= self.min_per_second * self.window + self.ratio * self.requests:
+            self.exhausted += 1
+            return False
+        bucket[2] += 1
+        self.retries += 1
+        self.withdrawn += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        self._bucket()
+        return {
+            "ratio": self.ratio,
+            "window": self.window,
+            "requests_in_window": self.requests,
+            "retries_in_window": self.retries,
+            "withdrawn": self.withdrawn,
+            "exhausted": self.exhausted,
+        }
+
+
+class LatencyWindow:
+    """Recent upstream latencies; percentiles are re-sorted at most every ``resort_every`` samples."""
+
+    def __init__(self, size: int = 500, min_samples: int = 20, resort_every: int = 25):
+        self.samples: deque = deque(maxlen=size)
+        self.min_samples = min_samples
+        self.resort_every = resort_every
+        self._sorted: List[float] = []
+        self._stale = 0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self._stale += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._stale >= self.resort_every or not self._sorted:
+            self._sorted = sorted(self.samples)
+            self._stale = 0
+        return self._sorted[min(int(len(self._sorted) * pct / 100), len(self._sorted) - 1)]
+
+
+class HedgePolicy:
+    def __init__(self, routes: Iterable[str], percentile: float = 95.0, min_delay: float = 0.005):
+        self.routes = [route.strip().strip("/") for route in routes if route.strip()]
+        self.percentile = percentile
+        self.min_delay = min_delay
+
+    def enabled_for(self, service_name: str, path: str, method: str) -> bool:
+        if method not in IDEMPOTENT_METHODS:
+            return False
+        route = f"{service_name}/{path.strip('/')}"
+        return any(route == prefix or route.startswith(prefix + "/") for prefix in self.routes)
+
+    def delay(self, latencies: LatencyWindow) -> Optional[float]:
+        observed = latencies.percentile(self.percentile)
+        return None if observed is None else max(observed, self.min_delay)
+
+
+async def _discard(task: asyncio.Task, release: Callable[[Any], Awaitable[None]]):
+    task.cancel()
+    with suppress(BaseException):
+        result = await task
+        await release(result)
+
+
+async def race(
+    first: Callable[[], Awaitable[Any]],
+    second: Callable[[], Awaitable[Any]],
+    delay: float,
+    may_start_second: Callable[[], bool],
+    acceptable: Callable[[Any], bool],
+    release: Callable[[Any], Awaitable[None]],
+) -> Any:
+    """Run ``first``; if it has not finished after ``delay``, also run ``second`` and keep the first acceptable result.
+
+    Returns ``(result, hedged, second_won)``. Losing results are handed to ``release``.
+    """
+    primary = asyncio.ensure_future(first())
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+    except asyncio.CancelledError:
+        await _discard(primary, release)
+        raise
+    if done or not may_start_second():
+        return await primary, False, False
+    hedge = asyncio.ensure_future(second())
+    pending = {primary, hedge}
+    fallback = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = None
+            for task in done:
+                if task.exception() is not None:
+                    continue
+                result = task.result()
+                if winner is None and acceptable(result):
+                    winner = (task, result)
+                elif fallback is None:
+                    fallback = (task, result)
+                else:
+                    await release(result)
+            if winner is not None:
+                if fallback is not None:
+                    await release(fallback[1])
+                return winner[1], True, winner[0] is hedge
+        if fallback is not None:
+            return fallback[1], True, fallback[0] is hedge
+        raise primary.exception()
+    finally:
+        for task in pending:
+            await _discard(task, release)
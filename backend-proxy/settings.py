@@ -0,0 +1,10 @@
+import os
+
+
+def service_env(service_name: str, key: str, global_key: str, default: str) -> str:
+    """Read <SERVICE>_SERVICE_<key>, falling back to the global setting."""
+    return os.getenv(f"{service_name.upper()}_SERVICE_{key}", os.getenv(global_key, default))
+
+
+def env_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
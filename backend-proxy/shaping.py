@@ -0,0 +1,279 @@
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Mapping, Optional
+
+import httpx
+
+from compression import Decompressor
+from settings import service_env
+
+FieldTree = Dict[str, Optional["FieldTree"]]
+
+_WHITESPACE = " \t\n\r"
+
+
+def build_field_tree(fields: Iterable[str]) -> FieldTree:
+    """Turn ["id", "guardian.name"] into {"id": None, "guardian": {"name": None}}; None selects the whole value."""
+    tree: FieldTree = {}
+    for field in fields:
+        *parents, leaf = field.strip().split(".")
+        if not leaf:
+            continue
+        node = tree
+        for part in parents:
+            if part in node and node[part] is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[leaf] = None
+    return tree
+
+
+def project(value: Any, tree: Optional[FieldTree]) -> Any:
+    if tree is None:
+        return value
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    return value
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+class JsonShaper:
+    """Incrementally rewrites a JSON list response, one record at a time.
+
+    Handles a ``{"data": [...], "total": ..., "per_page": ...}`` envelope or a
+    bare top-level array: records are projected to the requested fields and
+    the list is cut at ``max_items``. Only the record being parsed is held in
+    memory. Anything else is passed through unchanged.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None, max_items: Optional[int] = None):
+        self.tree = build_field_tree(fields) if fields else None
+        self.max_items = max_items
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.envelope = False
+        self.first_member = True
+        self.first_item = True
+        self.items = 0
+        self.dropped = 0
+        self.out: List[str] = []
+
+    def feed(self, text: str, final: bool = False) -> str:
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        self._run(final)
+        if final and self.pos < len(self.buffer):
+            # Malformed or truncated JSON: hand back what could not be parsed as is.
+            self.out.append(self.buffer[self.pos:])
+            self.pos = len(self.buffer)
+        out = "".join(self.out)
+        self.out.clear()
+        return out
+
+    def close(self) -> str:
+        return self.feed("", final=True)
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def _decode(self, final: bool):
+        """Decode the value at pos; returns (value, end) or None when more input is needed."""
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            return None
+        # A number at the end of the buffer may continue in the next chunk.
+        if end == len(self.buffer) and not final and isinstance(value, (int, float)) and not isinstance(value, bool):
+            return None
+        return value, end
+
+    def _run(self, final: bool):
+        while True:
+            self._skip_whitespace()
+            if self.pos >= len(self.buffer):
+                return
+            char = self.buffer[self.pos]
+            if self.state == "start":
+                if char == "{":
+                    self.state = "members"
+                    self.envelope = True
+                elif char == "[":
+                    self.state = "items"
+                else:
+                    self.state = "raw"
+                    continue
+                self.out.append(char)
+                self.pos += 1
+            elif self.state == "raw" or self.state == "done":
+                self.out.append(self.buffer[self.pos:])
+                self.pos = len(self.buffer)
+                return
+            elif self.state == "members":
+                if char == ",":
+                    self.pos += 1
+                elif char == "}":
+                    self.out.append(char)
+                    self.pos += 1
+                    self.state = "done"
+                elif not self._member(final):
+                    return
+            elif self.state == "items":
+                if char == ",":
+                    self.pos += 1
+                elif char == "]":
+                    self.out.append(char)
+                    self.pos += 1
+                    self.state = "members" if self.envelope else "done"
+                elif not self._item(final):
+                    return
+
+    def _member(self, final: bool) -> bool:
+        start = self.pos
+        decoded = self._decode(final)
+        if decoded is None:
+            return False
+        key, self.pos = decoded
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer) or self.buffer[self.pos] != ":":
+            self.pos = start
+            return False
+        self.pos += 1
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            self.pos = start
+            return False
+        prefix = ("" if self.first_member else ",") + _dumps(key) + ":"
+        if key == "data" and self.buffer[self.pos] == "[":
+            self.out.append(prefix + "[")
+            self.pos += 1
+            self.first_member = False
+            self.state = "items"
+            return True
+        decoded = self._decode(final)
+        if decoded is None:
+            self.pos = start
+            return False
+        value, self.pos = decoded
+        if key == "data":
+            value = project(value, self.tree)
+        elif key == "per_page" and self.max_items is not None and isinstance(value, int) and value > self.max_items:
+            value = self.max_items
+        self.out.append(prefix + _dumps(value))
+        self.first_member = False
+        return True
+
+    def _item(self, final: bool) -> bool:
+        decoded = self._decode(final)
+        if decoded is None:
+            return False
+        value, self.pos = decoded
+        if self.max_items is not None and self.items >= self.max_items:
+            self.dropped += 1
+            return True
+        self.out.append(("" if self.first_item else ",") + _dumps(project(value, self.tree)))
+        self.first_item = False
+        self.items += 1
+        return True
+
+
+def shape_body(body: bytes, shaper: JsonShaper) -> bytes:
+    return (shaper.feed(body.decode("utf-8", errors="replace")) + shaper.close()).encode()
+
+
+async def shape_chunks(chunks: AsyncIterator[bytes], shaper: JsonShaper, content_encoding: Optional[str]) -> AsyncIterator[bytes]:
+    decompressor = Decompressor(content_encoding) if content_encoding else None
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for chunk in chunks:
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        out = shaper.feed(decoder.decode(chunk))
+        if out:
+            yield out.encode()
+    tail = decompressor.flush() if decompressor is not None else b""
+    out = shaper.feed(decoder.decode(tail, final=True)) + shaper.close()
+    if out:
+        yield out.encode()
+
+
+class _ShapedStream(httpx.AsyncByteStream):
+    def __init__(self, response: httpx.Response, shaper: JsonShaper, content_encoding: Optional[str]):
+        self.response = response
+        self.shaper = shaper
+        self.content_encoding = content_encoding
+
+    async def __aiter__(self):
+        async for chunk in shape_chunks(self.response.aiter_raw(), self.shaper, self.content_encoding):
+            yield chunk
+
+    async def aclose(self):
+        await self.response.aclose()
+
+
+class ShapingPolicy:
+    """Applies ?fields= projection and a per-service page-size cap to JSON list responses."""
+
+    def __init__(self, services: Iterable[str], enabled: bool = True, decodable: Iterable[str] = ("gzip", "deflate")):
+        self.enabled = enabled
+        self.decodable = set(decodable)
+        self.max_page_sizes = {name: int(service_env(name, "MAX_PAGE_SIZE", "MAX_PAGE_SIZE", "0")) for name in services}
+        self.shaped = 0
+
+    def upstream_params(self, service_name: str, params: Dict[str, str]) -> Dict[str, str]:
+        cap = self.max_page_sizes[service_name]
+        if cap > 0 and "per_page" in params:
+            try:
+                if int(params["per_page"]) > cap:
+                    params["per_page"] = str(cap)
+            except ValueError:
+                pass
+        return params
+
+    def shaper_for(self, service_name: str, query: Mapping[str, str]) -> Optional[JsonShaper]:
+        if not self.enabled:
+            return None
+        fields = [field for field in query.get("fields", "").split(",") if field.strip()]
+        cap = self.max_page_sizes[service_name]
+        # The cap applies even without ?per_page=, since the upstream's default page may be larger.
+        if not fields and cap <= 0:
+            return None
+        return JsonShaper(fields or None, cap if cap > 0 else None)
+
+    def applies_to(self, status_code: int, headers: Mapping[str, str]) -> bool:
+        encoding = headers.get("content-encoding", "identity").lower()
+        return (
+            status_code == 200
+            and "json" in headers.get("content-type", "").lower()
+            and (encoding == "identity" or encoding in self.decodable)
+        )
+
+    def shape_response(self, response: httpx.Response, shaper: Optional[JsonShaper]) -> httpx.Response:
+        if shaper is None or not self.applies_to(response.status_code, response.headers):
+            return response
+        self.shaped += 1
+        encoding = response.headers.get("content-encoding", "identity").lower()
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ("content-length", "content-encoding")]
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            stream=_ShapedStream(response, shaper, None if encoding == "identity" else encoding),
+            request=response.request,
+        )
+
+    def shape_body(self, status_code: int, headers: Dict[str, str], body: bytes, shaper: Optional[JsonShaper]) -> bytes:
+        if shaper is None or not self.applies_to(status_code, headers) or headers.get("content-encoding", "identity") != "identity":
+            return body
+        self.shaped += 1
+        headers.pop("content-length", None)
+        return shape_body(body, shaper)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "max_page_sizes": self.max_page_sizes, "shaped": self.shaped}
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers using the same key."""
+
+    def __init__(self, routes: Iterable[str]):
+        self.routes = [route.strip().strip("/") for route in routes if route.strip()]
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def enabled_for(self, service_name: str, path: str) -> bool:
+        route = f"{service_name}/{path.strip('/')}"
+        return any(route == prefix or route.startswith(prefix + "/") for prefix in self.routes)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        # Shielded so a disconnecting caller does not cancel the call for everyone else.
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "routes": self.routes,
+            "in_flight": len(self.in_flight),
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
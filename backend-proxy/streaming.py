@@ -0,0 +1,71 @@
+import asyncio
+from contextlib import suppress
+from typing import Any, AsyncIterator, Dict
+
+_END = object()
+
+
+async def bounded_stream(source: AsyncIterator[bytes], max_chunks: int) -> AsyncIterator[bytes]:
+    """Relay chunks from source through a queue of at most max_chunks.
+
+    The producer blocks once the queue is full, so a slow consumer applies
+    backpressure all the way to the source instead of growing memory.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(max_chunks, 1))
+
+    async def pump():
+        try:
+            async for chunk in source:
+                if chunk:
+                    await queue.put(chunk)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+def wants_event_stream(accept: str) -> bool:
+    return "text/event-stream" in accept.lower()
+
+
+def is_event_stream(content_type: str) -> bool:
+    return content_type.lower().startswith("text/event-stream")
+
+
+class StreamSlots:
+    """Caps long-lived streams (SSE) per service; a slot is held until the stream ends."""
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = limits
+        self.active: Dict[str, int] = {name: 0 for name in limits}
+        self.rejected = 0
+
+    def try_acquire(self, service_name: str) -> bool:
+        if self.active[service_name] >= self.limits[service_name]:
+            self.rejected += 1
+            return False
+        self.active[service_name] += 1
+        return True
+
+    async def hold(self, service_name: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            self.active[service_name] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": dict(self.active), "limits": dict(self.limits), "rejected": self.rejected}
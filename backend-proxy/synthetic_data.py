@@ -0,0 +1,299 @@
+"""Column-wise synthetic records for large load tests.
+
+Each batch is generated one column at a time (NumPy when installed, the
+standard library otherwise) and only turned into rows when it is written, so
+memory stays bounded by the batch size whatever the dataset size. Every batch
+has its own RNG derived from (seed, entity, batch number): output is
+reproducible for a given seed, batch size and backend, and any batch can be
+regenerated without replaying the ones before it.
+"""
+import gzip
+import json
+import random
+import zlib
+from datetime import datetime
+from typing import IO, Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Columns = Dict[str, List[Any]]
+
+GRADES = ['K', '1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12']
+SUBJECTS = ['Mathematics', 'Science', 'English', 'Arabic', 'History', 'Geography', 'Physics', 'Chemistry', 'Biology', 'Computer Science', 'Art', 'Music', 'Physical Education']
+WORKFLOW_TYPES = ['Student Admission', 'Employee Onboarding', 'Grade Processing', 'Attendance Review', 'Disciplinary Action', 'Course Approval', 'Budget Request', 'Procurement Process']
+
+_UNIT_SECONDS = {"days": 86400, "hours": 3600, "minutes": 60}
+_NUMPY_UNITS = {"days": "D", "hours": "h", "minutes": "m"}
+
+
+def _format_uuids(raw: bytes) -> List[str]:
+    hexed = raw.hex()
+    return [
+        f"{hexed[i:i+8]}-{hexed[i+8:i+12]}-{hexed[i+12:i+16]}-{hexed[i+16:i+20]}-{hexed[i+20:i+32]}"
+        for i in range(0, len(hexed), 32)
+    ]
+
+
+class NumpyColumns:
+    backend = "numpy"
+
+    def __init__(self, seed: Sequence[int]):
+        self.rng = np.random.default_rng(list(seed))
+
+    def integers(self, low: int, high: int, n: int) -> List[int]:
+        """Uniform integers in [low, high], like random.randint."""
+        return self.rng.integers(low, high + 1, n).tolist()
+
+    def choice(self, options: Sequence[Any], n: int) -> List[Any]:
+        return np.asarray(options, dtype=object)[self.rng.integers(0, len(options), n)].tolist()
+
+    def flags(self, n: int, p: float = 0.5) -> List[bool]:
+        return (self.rng.random(n) < p).tolist()
+
+    def uuids(self, n: int) -> List[str]:
+        raw = self.rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+        return _format_uuids(raw.tobytes())
+
+    def timestamps(self, now: datetime, unit: str, low: int, high: int, n: int) -> List[str]:
+        """ISO timestamps offset from now by a uniform whole number of units in [low, high]."""
+        offsets = self.rng.integers(low, high + 1, n).astype(f"timedelta64[{_NUMPY_UNITS[unit]}]")
+        return np.datetime_as_string(np.datetime64(now.replace(tzinfo=None), "us") + offsets, unit="us").tolist()
+
+
+class PythonColumns:
+    backend = "python"
+
+    def __init__(self, seed: Sequence[int]):
+        self.rng = random.Random(":".join(map(str, seed)))
+
+    def integers(self, low: int, high: int, n: int) -> List[int]:
+        return self.rng.choices(range(low, high + 1), k=n)
+
+    def choice(self, options: Sequence[Any], n: int) -> List[Any]:
+        return self.rng.choices(options, k=n)
+
+    def flags(self, n: int, p: float = 0.5) -> List[bool]:
+        random_ = self.rng.random
+        return [random_() < p for _ in range(n)]
+
+    def uuids(self, n: int) -> List[str]:
+        raw = bytearray(self.rng.randbytes(16 * n))
+        for i in range(6, len(raw), 16):
+            raw[i] = (raw[i] & 0x0F) | 0x40
+            raw[i + 2] = (raw[i + 2] & 0x3F) | 0x80
+        return _format_uuids(bytes(raw))
+
+    def timestamps(self, now: datetime, unit: str, low: int, high: int, n: int) -> List[str]:
+        base = now.replace(tzinfo=None).timestamp()
+        step = _UNIT_SECONDS[unit]
+        fromtimestamp = datetime.fromtimestamp
+        return [fromtimestamp(base + offset * step).isoformat(timespec="microseconds") for offset in self.integers(low, high, n)]
+
+
+def student_columns(c, start: int, n: int, now: datetime) -> Columns:
+    numbers = range(start + 1, start + n + 1)
+    return {
+        'id': c.uuids(n),
+        'firstName': [f'Student{i}' for i in numbers],
+        'lastName': [f'LastName{i}' for i in numbers],
+        'email': [f'student{i}@school.edu' for i in numbers],
+        'dateOfBirth': c.timestamps(now, "days", -18*365, -6*365, n),
+        'grade': c.choice(GRADES, n),
+        'section': c.choice(['A', 'B', 'C', 'D'], n),
+        'status': c.choice(['Active', 'Inactive', 'Graduated'], n),
+        'enrollmentDate': c.timestamps(now, "days", -1000, -30, n),
+        'guardianName': [f'Guardian{i}' for i in numbers],
+        'guardianPhone': [f'+966{phone}' for phone in c.integers(500000000, 599999999, n)],
+        'address': [f'Address {i}, Riyadh, Saudi Arabia' for i in numbers],
+    }
+
+
+def employee_columns(c, start: int, n: int, now: datetime) -> Columns:
+    numbers = range(start + 1, start + n + 1)
+    return {
+        'id': c.uuids(n),
+        'firstName': [f'Employee{i}' for i in numbers],
+        'lastName': [f'EmpLast{i}' for i in numbers],
+        'email': [f'employee{i}@school.edu' for i in numbers],
+        'position': c.choice(['Teacher', 'Administrator', 'Nurse', 'Driver', 'Janitor', 'Security', 'Librarian'], n),
+        'department': c.choice(['Academic', 'Administration', 'Health', 'Transportation', 'Maintenance'], n),
+        'hireDate': c.timestamps(now, "days", -2000, -30, n),
+        'salary': c.integers(3000, 15000, n),
+        'status': c.choice(['Active', 'Inactive', 'On Leave'], n),
+        'phone': [f'+966{phone}' for phone in c.integers(500000000, 599999999, n)],
+        'nationalId': [str(value) for value in c.integers(1000000000, 2999999999, n)],
+    }
+
+
+def course_columns(c, start: int, n: int, now: datetime) -> Columns:
+    return {
+        'id': c.uuids(n),
+        'title': [f'{subject} - Level {level}' for subject, level in zip(c.choice(SUBJECTS, n), c.integers(1, 12, n))],
+        'description': [
+            f'Comprehensive course covering {subject} curriculum for grade {grade}'
+            for subject, grade in zip(c.choice(SUBJECTS, n), c.integers(1, 12, n))
+        ],
+        'instructor': [f'Teacher{i}' for i in c.integers(1, 100, n)],
+        'grade': c.choice(GRADES, n),
+        'subject': c.choice(SUBJECTS, n),
+        'credits': c.integers(1, 4, n),
+        'status': c.choice(['Active', 'Draft', 'Archived'], n),
+        'startDate': c.timestamps(now, "days", -180, 0, n),
+        'endDate': c.timestamps(now, "days", 30, 180, n),
+        'enrolledStudents': c.integers(15, 35, n),
+    }
+
+
+def exam_columns(c, start: int, n: int, now: datetime) -> Columns:
+    return {
+        'id': c.uuids(n),
+        'title': [f'Exam {i} - {subject}' for i, subject in zip(range(start + 1, start + n + 1), c.choice(SUBJECTS, n))],
+        'description': [f'Comprehensive examination for {subject}' for subject in c.choice(SUBJECTS, n)],
+        'subject': c.choice(SUBJECTS, n),
+        'grade': c.choice(GRADES, n),
+        'duration': c.integers(60, 180, n),
+        'totalMarks': c.integers(50, 100, n),
+        'passingMarks': c.integers(30, 60, n),
+        'examDate': c.timestamps(now, "days", 1, 90, n),
+        'status': c.choice(['Scheduled', 'Active', 'Completed', 'Cancelled'], n),
+        'type': c.choice(['Midterm', 'Final', 'Quiz', 'Assignment'], n),
+        'instructions': ['Please read all questions carefully before answering.'] * n,
+    }
+
+
+def workflow_columns(c, start: int, n: int, now: datetime) -> Columns:
+    return {
+        'id': c.uuids(n),
+        'name': [f'{kind} - {i}' for i, kind in zip(range(start + 1, start + n + 1), c.choice(WORKFLOW_TYPES, n))],
+        'description': [f'Automated workflow for {kind}' for kind in c.choice(WORKFLOW_TYPES, n)],
+        'type': c.choice(WORKFLOW_TYPES, n),
+        'status': c.choice(['Active', 'Pending', 'Completed', 'Cancelled'], n),
+        'priority': c.choice(['Low', 'Medium', 'High', 'Critical'], n),
+        'assignee': [f'Employee{i}' for i in c.integers(1, 100, n)],
+        'createdDate': c.timestamps(now, "days", -30, -1, n),
+        'dueDate': c.timestamps(now, "days", 1, 30, n),
+        'progress': c.integers(0, 100, n),
+    }
+
+
+def dashboard_columns(c, start: int, n: int, now: datetime) -> Columns:
+    widget_ids = c.uuids(3 * n)
+    topics = ["Student Performance", "Attendance Tracking", "Financial Overview", "Staff Management", "Course Analytics"]
+    return {
+        'id': c.uuids(n),
+        'name': [f'Dashboard {i}' for i in range(start + 1, start + n + 1)],
+        'description': [f'Analytics dashboard for {topic}' for topic in c.choice(topics, n)],
+        'type': c.choice(['Student Analytics', 'Financial', 'Attendance', 'Performance', 'Administrative'], n),
+        'widgets': [
+            [
+                {'id': widget_ids[3 * i], 'type': 'chart', 'title': 'Performance Chart'},
+                {'id': widget_ids[3 * i + 1], 'type': 'table', 'title': 'Data Table'},
+                {'id': widget_ids[3 * i + 2], 'type': 'metric', 'title': 'Key Metrics'},
+            ]
+            for i in range(n)
+        ],
+        'createdAt': c.timestamps(now, "days", -100, -1, n),
+        'lastModified': c.timestamps(now, "days", -10, 0, n),
+        'isPublic': c.flags(n),
+    }
+
+
+def chat_session_columns(c, start: int, n: int, now: datetime) -> Columns:
+    return {
+        'id': c.uuids(n),
+        'title': [f'Chat Session {i}' for i in range(start + 1, start + n + 1)],
+        'userId': [f'user{i}' for i in c.integers(1, 200, n)],
+        'type': c.choice(['Academic Help', 'Administrative Query', 'Technical Support', 'General Inquiry'], n),
+        'status': c.choice(['Active', 'Completed', 'Pending'], n),
+        'messageCount': c.integers(1, 50, n),
+        'startTime': c.timestamps(now, "hours", -168, -1, n),
+        'lastActivity': c.timestamps(now, "minutes", -1440, -1, n),
+        'satisfaction': [score if rated else None for score, rated in zip(c.integers(1, 5, n), c.flags(n))],
+    }
+
+
+def tenant_columns(c, start: int, n: int, now: datetime) -> Columns:
+    numbers = range(start + 1, start + n + 1)
+    return {
+        'id': c.uuids(n),
+        'name': [f'School District {i}' for i in numbers],
+        'domain': [f'district{i}.edu.sa' for i in numbers],
+        'type': c.choice(['Public School', 'Private School', 'University', 'Training Center'], n),
+        'status': c.choice(['Active', 'Inactive', 'Trial', 'Suspended'], n),
+        'subscriptionPlan': c.choice(['Basic', 'Standard', 'Premium', 'Enterprise'], n),
+        'studentCount': c.integers(100, 5000, n),
+        'staffCount': c.integers(10, 500, n),
+        'createdDate': c.timestamps(now, "days", -1000, -30, n),
+        'contactEmail': [f'admin@district{i}.edu.sa' for i in numbers],
+        'location': c.choice(['Riyadh', 'Jeddah', 'Dammam', 'Mecca', 'Medina'], n),
+    }
+
+
+ENTITY_COLUMNS: Dict[str, Callable[..., Columns]] = {
+    "students": student_columns,
+    "employees": employee_columns,
+    "courses": course_columns,
+    "exams": exam_columns,
+    "workflows": workflow_columns,
+    "dashboards": dashboard_columns,
+    "chat_sessions": chat_session_columns,
+    "tenants": tenant_columns,
+}
+
+
+def backend_name(use_numpy: bool = True) -> str:
+    return "numpy" if use_numpy and np is not None else "python"
+
+
+def batch_count(count: int, batch_size: int) -> int:
+    return (count + batch_size - 1) // batch_size
+
+
+def column_batch(entity: str, number: int, count: int, batch_size: int, seed: int, now: datetime, use_numpy: bool = True) -> Columns:
+    """Generate batch `number` of an entity with `count` records in total."""
+    backend = NumpyColumns if backend_name(use_numpy) == "numpy" else PythonColumns
+    start = number * batch_size
+    size = min(batch_size, count - start)
+    return ENTITY_COLUMNS[entity](backend((seed, zlib.crc32(entity.encode()), number)), start, size, now)
+
+
+def column_batches(entity: str, count: int, batch_size: int, seed: int, now: datetime, use_numpy: bool = True) -> Iterator[Tuple[int, Columns]]:
+    for number in range(batch_count(count, batch_size)):
+        yield number, column_batch(entity, number, count, batch_size, seed, now, use_numpy)
+
+
+def rows(columns: Columns) -> List[Dict[str, Any]]:
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def open_output(path: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    return open(path, "w", encoding="utf-8")
+
+
+def write_ndjson(batches: Iterator[Tuple[int, Columns]], out: IO[str]) -> int:
+    written = 0
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    for _, columns in batches:
+        batch_rows = rows(columns)
+        out.write("".join(dumps(row) + "\n" for row in batch_rows))
+        written += len(batch_rows)
+    return written
+
+
+def write_columnar(batches: Iterator[Tuple[int, Columns]], out: IO[str], batch_size: int) -> int:
+    """One JSON line per batch with field names stored once: {"batch", "offset", "count", "columns"}."""
+    written = 0
+    for number, columns in batches:
+        count = len(next(iter(columns.values()), []))
+        out.write(json.dumps({"batch": number, "offset": number * batch_size, "count": count, "columns": columns}, separators=(",", ":")))
+        out.write("\n")
+        written += count
+    return written
@@ -0,0 +1,131 @@
+import math
+import time
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+import httpx
+
+from retries import LatencyWindow
+from settings import service_env
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, service_name: str):
+        super().__init__(f"Deadline exceeded before calling {service_name}")
+        self.service_name = service_name
+
+
+def route_key(service_name: str, path: str) -> str:
+    # Adaptive timeouts are tracked per service and first path segment to keep cardinality bounded.
+    return f"{service_name}/{path.strip('/').split('/', 1)[0]}"
+
+
+class TimeoutPolicy:
+    """Chooses the upstream timeout per route: a manual rule, else adaptive from latency, else the service default."""
+
+    def __init__(
+        self,
+        services: Iterable[str],
+        rules: Dict[str, float],
+        adaptive: bool = False,
+        percentile: float = 99.0,
+        multiplier: float = 3.0,
+        min_timeout: float = 0.5,
+        max_timeout: float = 60.0,
+        window_size: int = 500,
+        deadline_header: str = "x-request-deadline-ms",
+        min_budget: float = 0.01,
+        max_budget: float = 3600.0,
+    ):
+        self.defaults = {name: float(service_env(name, "TIMEOUT", "UPSTREAM_TIMEOUT", "5")) for name in services}
+        self.rules = rules
+        self.adaptive = adaptive
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.window_size = window_size
+        self.deadline_header = deadline_header.lower()
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.latencies: Dict[str, LatencyWindow] = {}
+
+    def _rule_for(self, service_name: str, path: str) -> Optional[float]:
+        route = f"{service_name}/{path.strip('/')}"
+        best, best_len = None, -1
+        for prefix, timeout in self.rules.items():
+            if (route == prefix or route.startswith(prefix + "/")) and len(prefix) > best_len:
+                best, best_len = timeout, len(prefix)
+        return best
+
+    def _adaptive_for(self, service_name: str, path: str) -> Optional[float]:
+        window = self.latencies.get(route_key(service_name, path))
+        observed = window.percentile(self.percentile) if window is not None else None
+        if observed is None:
+            return None
+        return min(max(observed * self.multiplier, self.min_timeout), self.max_timeout)
+
+    def timeout_for(self, service_name: str, path: str) -> Tuple[float, str]:
+        timeout = self._rule_for(service_name, path)
+        if timeout is not None:
+            return timeout, "manual"
+        if self.adaptive:
+            timeout = self._adaptive_for(service_name, path)
+            if timeout is not None:
+                return timeout, "adaptive"
+        return self.defaults[service_name], "default"
+
+    def observe(self, service_name: str, path: str, seconds: float):
+        if not self.adaptive:
+            return
+        key = route_key(service_name, path)
+        window = self.latencies.get(key)
+        if window is None:
+            window = self.latencies[key] = LatencyWindow(self.window_size)
+        window.observe(seconds)
+
+    def deadline_from(self, headers: Mapping[str, str]) -> Optional[float]:
+        """Turn the client's remaining budget in milliseconds into a monotonic deadline."""
+        value = headers.get(self.deadline_header)
+        if not value:
+            return None
+        try:
+            budget = float(value) / 1000
+        except ValueError:
+            return None
+        if not math.isfinite(budget):
+            return None
+        return time.monotonic() + min(max(budget, 0.0), self.max_budget)
+
+    def expired(self, deadline: Optional[float]) -> bool:
+        return deadline is not None and deadline - time.monotonic() < self.min_budget
+
+    def apply_deadline(self, service_name: str, request: httpx.Request, deadline: Optional[float]):
+        """Clamp the attempt's timeouts to the remaining budget and pass that budget downstream."""
+        if deadline is None:
+            return
+        remaining = deadline - time.monotonic()
+        if remaining < self.min_budget:
+            raise DeadlineExceeded(service_name)
+        timeouts = request.extensions.get("timeout", {})
+        request.extensions["timeout"] = {key: remaining if value is None else min(value, remaining) for key, value in timeouts.items()}
+        request.headers[self.deadline_header] = str(int(remaining * 1000))
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {}
+        for key in sorted(self.latencies):
+            service_name, _, path = key.partition("/")
+            timeout, source = self.timeout_for(service_name, path)
+            observed = self.latencies[key].percentile(self.percentile)
+            routes[key] = {
+                "timeout": round(timeout, 3),
+                "source": source,
+                f"latency_p{self.percentile:g}": None if observed is None else round(observed, 6),
+                "samples": len(self.latencies[key].samples),
+            }
+        return {
+            "adaptive": self.adaptive,
+            "defaults": self.defaults,
+            "rules": self.rules,
+            "deadline_header": self.deadline_header,
+            "routes": routes,
+        }
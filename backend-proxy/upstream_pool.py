@@ -0,0 +1,143 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from metrics import record_phase
+from settings import env_bool, service_env
+
+logger = logging.getLogger(__name__)
+
+
+def _env_value(service_name: str, key: str, default: str) -> str:
+    return service_env(service_name, key, f"UPSTREAM_{key}", default)
+
+
+class RequestTrace:
+    """Collects httpcore trace events for a single upstream request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events: Dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]):
+        self.events[event_name.split(".", 1)[-1]] = time.perf_counter()
+
+    def duration(self, phase: str) -> float:
+        started = self.events.get(f"{phase}.started")
+        complete = self.events.get(f"{phase}.complete")
+        if started is None or complete is None:
+            return 0.0
+        return complete - started
+
+    @property
+    def connect_time(self) -> float:
+        return self.duration("connect_tcp") + self.duration("start_tls")
+
+    @property
+    def wait_time(self) -> float:
+        headers_started = self.events.get("send_request_headers.started")
+        if headers_started is None:
+            return 0.0
+        return max(headers_started - self.started - self.connect_time, 0.0)
+
+    def phases(self) -> Dict[str, float]:
+        return {
+            "pool": self.wait_time,
+            "connect": self.duration("connect_tcp"),
+            "tls": self.duration("start_tls"),
+            "wait": self.duration("receive_response_headers"),
+        }
+
+
+class UpstreamPool:
+    def __init__(
+        self,
+        service_name: str,
+        base_url: str,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+    ):
+        self.service_name = service_name
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested for %s but 'h2' is not installed, using HTTP/1.1", service_name)
+                self.http2 = False
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=self.http2,
+        )
+        self.requests_total = 0
+        self.connects_total = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @classmethod
+    def from_env(cls, service_name: str, base_url: str) -> "UpstreamPool":
+        return cls(
+            service_name,
+            base_url,
+            max_connections=int(_env_value(service_name, "MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(_env_value(service_name, "MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(_env_value(service_name, "KEEPALIVE_EXPIRY", "30")),
+            http2=env_bool(_env_value(service_name, "HTTP2", "false")),
+        )
+
+    def _record(self, trace: RequestTrace):
+        self.requests_total += 1
+        if "connect_tcp.started" in trace.events:
+            self.connects_total += 1
+        wait_time = trace.wait_time
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    async def send(self, request: httpx.Request, stream: bool = False, trace: Optional[RequestTrace] = None) -> httpx.Response:
+        trace = trace or RequestTrace()
+        request.extensions["trace"] = trace
+        try:
+            return await self.client.send(request, stream=stream)
+        finally:
+            self._record(trace)
+            for phase, seconds in trace.phases().items():
+                if seconds:
+                    record_phase(phase, seconds)
+
+    async def request(self, method: str, url: str, trace: Optional[RequestTrace] = None, **kwargs) -> httpx.Response:
+        return await self.send(self.client.build_request(method, url, **kwargs), trace=trace)
+
+    def stats(self) -> Dict[str, Any]:
+        transport = getattr(self.client, "_transport", None)
+        connections = list(getattr(getattr(transport, "_pool", None), "connections", []))
+        open_connections = [c for c in connections if not c.is_closed()]
+        idle = sum(1 for c in open_connections if c.is_idle())
+        return {
+            "url": self.base_url,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "open": len(open_connections),
+            "idle": idle,
+            "in_use": len(open_connections) - idle,
+            "requests_total": self.requests_total,
+            "connects_total": self.connects_total,
+            "wait_time_avg_ms": round(self.wait_time_total / self.requests_total * 1000, 3) if self.requests_total else 0.0,
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketDisconnect
+
+from settings import service_env
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+    from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
+except ImportError:
+    ws_connect = None
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_HEADERS = ("authorization", "cookie", "x-tenant-id", "x-request-id", "user-agent", "origin")
+
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_TRY_AGAIN_LATER = 1013
+# Codes that describe how a connection ended but must never be sent in a close frame.
+CLOSE_NO_STATUS = 1005
+RESERVED_CLOSE_CODES = {CLOSE_NO_STATUS, 1006, 1015}
+
+
+def websocket_url(http_url: str) -> str:
+    if http_url.startswith("https://"):
+        return "wss://" + http_url[len("https://"):]
+    if http_url.startswith("http://"):
+        return "ws://" + http_url[len("http://"):]
+    return http_url
+
+
+def sendable_close_code(code: Optional[int], abnormal: int) -> int:
+    """Map the peer's close code to one we may forward; reserved codes become 1000 or ``abnormal``."""
+    if code is None or code == CLOSE_NO_STATUS:
+        return 1000
+    return abnormal if code in RESERVED_CLOSE_CODES else code
+
+
+class WebSocketProxy:
+    """Relays WebSocket frames between a client and an upstream replica with idle timeouts and bounded buffers."""
+
+    def __init__(
+        self,
+        services: Iterable[str],
+        idle_timeout: float = 300.0,
+        connect_timeout: float = 5.0,
+        max_message_bytes: int = 1024 * 1024,
+        max_queue: int = 16,
+    ):
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.max_message_bytes = max_message_bytes
+        self.max_queue = max_queue
+        self.limits = {name: int(service_env(name, "WEBSOCKET_MAX_CONNECTIONS", "WEBSOCKET_MAX_CONNECTIONS", "1000")) for name in services}
+        self.active: Dict[str, int] = {name: 0 for name in self.limits}
+        self.rejected = 0
+        self.idle_closed = 0
+
+    async def proxy(self, websocket: WebSocket, service_name: str, upstream_url: str, connected: Optional[Callable[[bool, float], None]] = None):
+        """Relay one connection; ``connected(ok, seconds)`` is told how the upstream handshake went."""
+        if ws_connect is None:
+            logger.error("WebSocket proxying needs the 'websockets' package")
+            await websocket.close(code=CLOSE_INTERNAL_ERROR)
+            return
+        if self.active[service_name] >= self.limits[service_name]:
+            self.rejected += 1
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            return
+
+        self.active[service_name] += 1
+        try:
+            headers = [(name, websocket.headers[name]) for name in FORWARDED_HEADERS if name in websocket.headers]
+            subprotocols = websocket.scope.get("subprotocols") or None
+            started = time.monotonic()
+            try:
+                upstream = await ws_connect(
+                    upstream_url,
+                    additional_headers=headers,
+                    subprotocols=subprotocols,
+                    open_timeout=self.connect_timeout,
+                    max_size=self.max_message_bytes,
+                    max_queue=self.max_queue,
+                    write_limit=self.max_message_bytes,
+                    # Idle handling is ours; keepalive pings would reset it on quiet connections.
+                    ping_interval=None,
+                )
+            except (OSError, asyncio.TimeoutError, InvalidHandshake, InvalidURI) as e:
+                logger.info("WebSocket upstream for %s unavailable at %s: %s", service_name, upstream_url, str(e) or type(e).__name__)
+                if connected is not None:
+                    connected(False, time.monotonic() - started)
+                await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+                return
+            if connected is not None:
+                connected(True, time.monotonic() - started)
+            try:
+                await websocket.accept(subprotocol=upstream.subprotocol)
+                await self._relay(websocket, upstream)
+            finally:
+                await upstream.close()
+        finally:
+            self.active[service_name] -= 1
+
+    async def _relay(self, websocket: WebSocket, upstream):
+        last_activity = time.monotonic()
+        close_code: Optional[int] = None
+
+        async def client_to_upstream():
+            nonlocal last_activity, close_code
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    close_code = message.get("code", 1000)
+                    await upstream.close(code=sendable_close_code(close_code, CLOSE_GOING_AWAY))
+                    return
+                last_activity = time.monotonic()
+                # Awaiting the upstream write stops us reading from the client, so a slow upstream pushes back.
+                if message.get("bytes") is not None:
+                    await upstream.send(message["bytes"])
+                elif message.get("text") is not None:
+                    await upstream.send(message["text"])
+
+        async def upstream_to_client():
+            nonlocal last_activity
+            async for data in upstream:
+                last_activity = time.monotonic()
+                if isinstance(data, bytes):
+                    await websocket.send_bytes(data)
+                else:
+                    await websocket.send_text(data)
+
+        async def idle_watchdog():
+            while True:
+                remaining = last_activity + self.idle_timeout - time.monotonic()
+                if remaining <= 0:
+                    self.idle_closed += 1
+                    return
+                await asyncio.sleep(remaining)
+
+        tasks = [asyncio.ensure_future(coro) for coro in (client_to_upstream(), upstream_to_client(), idle_watchdog())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with suppress(asyncio.CancelledError, ConnectionClosed, WebSocketDisconnect, RuntimeError):
+                    await task
+        if close_code is None:
+            upstream_code = upstream.close_code
+            if tasks[2] in done:
+                upstream_code = CLOSE_GOING_AWAY
+            with suppress(RuntimeError, WebSocketDisconnect):
+                await websocket.close(code=sendable_close_code(upstream_code, CLOSE_INTERNAL_ERROR))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": ws_connect is not None,
+            "idle_timeout": self.idle_timeout,
+            "active": dict(self.active),
+            "limits": dict(self.limits),
+            "rejected": self.rejected,
+            "idle_closed": self.idle_closed,
+        }
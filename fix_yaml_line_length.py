@@ -1,27 +1,51 @@
 #!/usr/bin/env python3
+"""Fix YAML line length violations in place.
+
+    python fix_yaml_line_length.py                                  # .github/workflows
+    python fix_yaml_line_length.py k8s docker-compose.production.yml
+    python fix_yaml_line_length.py --check --jobs 8 k8s             # report only, exit 1 on violations
+
+Directories are searched recursively for .yml/.yaml files. Files are only
+rewritten (atomically) when their content changes, and files already known to
+be clean are skipped through a content-hash cache, so repeated runs over a
+large tree only touch what was edited since the last run.
+"""
+import argparse
+import hashlib
+import io
+import json
 import os
-import re
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+YAML_EXTENSIONS = ('.yml', '.yaml')
+SKIP_DIRS = {'.git', 'node_modules', '.venv', 'venv', '__pycache__'}
+DEFAULT_CACHE = '.fix_yaml_line_length_cache.json'
+# Bump when the fixing rules change so cached results are not trusted any more.
+CACHE_VERSION = 3
+
+
+def fix_yaml_text(text, max_length=80):
+    """Return text with YAML line length violations broken up where possible."""
+    # Split on \n only, as readlines() does; str.splitlines() also breaks on \x0c, \x85, U+2028 and friends.
+    lines = io.StringIO(text).readlines()
 
-def fix_yaml_line_length(file_path, max_length=80):
-    """Fix YAML line length violations by breaking long lines appropriately."""
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-    
     fixed_lines = []
     for line_num, line in enumerate(lines, 1):
         # Remove trailing whitespace
         line = line.rstrip() + '\n'
-        
+
         # Skip if line is within limit
         if len(line.rstrip()) <= max_length:
             fixed_lines.append(line)
             continue
-        
+
         # Handle different types of long lines
         stripped = line.lstrip()
         indent = line[:len(line) - len(stripped)]
-        
+
         # Handle long comments
         if stripped.startswith('#'):
             # Break long comments at word boundaries
@@ -30,17 +54,18 @@ def fix_yaml_line_length(file_path, max_length=80):
                 words = comment_content.split()
                 current_line = indent + '#'
                 for word in words:
-                    if len(current_line + ' ' + word) <= max_length:
+                    # A word too long for a line of its own stays where it is and is left for long_lines() to report.
+                    if len(current_line + ' ' + word) <= max_length or current_line == indent + '#':
                         current_line += ' ' + word
                     else:
                         fixed_lines.append(current_line + '\n')
                         current_line = indent + '# ' + word
-                if current_line.strip() != indent.strip() + '#':
+                if current_line != indent + '#':
                     fixed_lines.append(current_line + '\n')
             else:
                 fixed_lines.append(line)
             continue
-        
+
         # Handle long string values
         if ':' in stripped and len(line.rstrip()) > max_length:
             # Try to break at logical points
@@ -57,7 +82,7 @@ def fix_yaml_line_length(file_path, max_length=80):
                     words = content.split()
                     current_line = indent + '  '
                     for word in words:
-                        if len(current_line + word + ' ') <= max_length:
+                        if len(current_line + word + ' ') <= max_length or not current_line.strip():
                             current_line += word + ' '
                         else:
                             fixed_lines.append(current_line.rstrip() + '\n')
@@ -70,26 +95,218 @@ def fix_yaml_line_length(file_path, max_length=80):
                 fixed_lines.append(line)
         else:
             fixed_lines.append(line)
-    
-    # Write back to file
-    with open(file_path, 'w') as f:
-        f.writelines(fixed_lines)
 
-def main():
-    workflow_dir = '.github/workflows'
-    if not os.path.exists(workflow_dir):
-        print(f"Directory {workflow_dir} not found")
-        return
-    
-    for filename in os.listdir(workflow_dir):
-        if filename.endswith('.yml') or filename.endswith('.yaml'):
-            file_path = os.path.join(workflow_dir, filename)
-            print(f"Processing {file_path}...")
+    return ''.join(fixed_lines)
+
+
+def write_atomic(file_path, content):
+    """Replace file_path with content via a temporary file in the same directory, keeping its mode."""
+    # Write through symlinks rather than replacing the link with a regular file.
+    file_path = os.path.realpath(file_path)
+    directory = os.path.dirname(file_path)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(file_path) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def fix_yaml_line_length(file_path, max_length=80):
+    """Fix YAML line length violations in file_path; returns True if the file was rewritten."""
+    with open(file_path, 'r') as f:
+        original = f.read()
+    fixed = fix_yaml_text(original, max_length)
+    if fixed == original:
+        return False
+    write_atomic(file_path, fixed)
+    return True
+
+
+def long_lines(text, max_length=80):
+    return [line_num for line_num, line in enumerate(text.split('\n'), 1) if len(line.rstrip()) > max_length]
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def process_file(file_path, max_length, check):
+    """Fix or check one file.
+
+    Returns (path, changed, over-length line numbers, content hash, error). In
+    check mode nothing is written and ``changed`` means the fixer would change
+    the file; otherwise the line numbers are those the fixer could not break.
+    The hash is only set for files left with no violations, the ones safe to cache.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        original = data.decode()
+        fixed = fix_yaml_text(original, max_length)
+        changed = fixed != original
+        if check:
+            violations = long_lines(original, max_length)
+            clean = not changed and not violations
+            return file_path, changed, violations, content_hash(data) if clean else None, None
+        if changed:
+            write_atomic(file_path, fixed)
+        violations = long_lines(fixed, max_length)
+        return file_path, changed, violations, None if violations else content_hash(fixed.encode()), None
+    except Exception as e:
+        return file_path, False, [], None, str(e)
+
+
+def find_yaml_files(paths, missing):
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+                for filename in sorted(files):
+                    if filename.endswith(YAML_EXTENSIONS):
+                        file_path = os.path.join(root, filename)
+                        if file_path not in seen:
+                            seen.add(file_path)
+                            yield file_path
+        elif os.path.isfile(path):
+            if path not in seen:
+                seen.add(path)
+                yield path
+        else:
+            print(f"Path {path} not found")
+            missing.append(path)
+
+
+class HashCache:
+    """Remembers files known to be clean, keyed by path with their size, mtime and content hash.
+
+    A matching size and mtime skips the file without reading it; otherwise a
+    matching content hash skips fixing it.
+    """
+
+    def __init__(self, path: Optional[str], max_length: int):
+        self.path = path
+        self.key = f'{CACHE_VERSION}:{max_length}'
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        if path and os.path.exists(path):
             try:
-                fix_yaml_line_length(file_path)
-                print(f"Fixed {file_path}")
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+                with open(path) as f:
+                    state = json.load(f)
+                if state.get('key') == self.key:
+                    self.entries = state.get('files', {})
+            except (OSError, ValueError):
+                self.entries = {}
+
+    @staticmethod
+    def _stat(file_path) -> Tuple[int, int]:
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+
+    def is_clean(self, file_path) -> bool:
+        entry = self.entries.get(os.path.abspath(file_path))
+        if entry is None:
+            return False
+        size, mtime_ns = self._stat(file_path)
+        if entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            return True
+        if entry['size'] != size:
+            return False
+        with open(file_path, 'rb') as f:
+            if content_hash(f.read()) != entry['hash']:
+                return False
+        # Touched but not edited: refresh the stat so the next run skips the read too.
+        self.record(file_path, entry['hash'])
+        return True
+
+    def record(self, file_path, digest):
+        size, mtime_ns = self._stat(file_path)
+        self.entries[os.path.abspath(file_path)] = {'size': size, 'mtime_ns': mtime_ns, 'hash': digest}
+        self.dirty = True
+
+    def forget(self, file_path):
+        if self.entries.pop(os.path.abspath(file_path), None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.fix_yaml_cache.', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'key': self.key, 'files': self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+
+def run(files: List[str], max_length: int, check: bool, jobs: int) -> Iterable[Tuple[str, bool, List[int], Optional[str], Optional[str]]]:
+    if jobs <= 1 or len(files) < 2:
+        for file_path in files:
+            yield process_file(file_path, max_length, check)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        chunksize = max(len(files) // (jobs * 4), 1)
+        yield from pool.map(process_file, files, [max_length] * len(files), [check] * len(files), chunksize=chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fix YAML line length violations.')
+    parser.add_argument('paths', nargs='*', default=['.github/workflows'], help='Files or directories to process (default: .github/workflows)')
+    parser.add_argument('--max-length', type=int, default=80)
+    parser.add_argument('--check', action='store_true', help='Report files that need fixing without writing; exit 1 if any do')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Worker processes (0 = one per CPU)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help=f'Content-hash cache file (default: {DEFAULT_CACHE})')
+    parser.add_argument('--no-cache', action='store_true', help='Process every file even if it is cached as clean')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Also list files that were already clean')
+    args = parser.parse_args()
+
+    cache = HashCache(None if args.no_cache else args.cache, args.max_length)
+    missing: List[str] = []
+    files = list(find_yaml_files(args.paths, missing))
+    pending = [file_path for file_path in files if not cache.is_clean(file_path)]
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    counts = {'clean': 0, 'fixed': 0, 'needs-fix': 0, 'too-long': 0, 'error': len(missing)}
+    for file_path, changed, violations, digest, error in run(pending, args.max_length, args.check, jobs):
+        if digest is not None:
+            cache.record(file_path, digest)
+        else:
+            cache.forget(file_path)
+        if error is not None:
+            counts['error'] += 1
+            print(f"Error processing {file_path}: {error}")
+            continue
+        lines = ', '.join(map(str, violations[:10])) + (', ...' if len(violations) > 10 else '')
+        if args.check:
+            if changed or violations:
+                counts['needs-fix'] += 1
+                print(f"{file_path}: needs fixing" + (f" (lines over {args.max_length}: {lines})" if violations else " (trailing whitespace)"))
+            else:
+                counts['clean'] += 1
+                if args.verbose:
+                    print(f"Clean {file_path}")
+            continue
+        if changed:
+            counts['fixed'] += 1
+            print(f"Fixed {file_path}")
+        if violations:
+            counts['too-long'] += 1
+            print(f"{file_path}: lines still over {args.max_length}: {lines}")
+        elif not changed:
+            counts['clean'] += 1
+            if args.verbose:
+                print(f"Clean {file_path}")
+    cache.save()
+
+    skipped = len(files) - len(pending)
+    summary = f"{counts['fixed']} fixed, {counts['too-long']} still too long" if not args.check else f"{counts['needs-fix']} need fixing"
+    print(f"{len(files)} files: {summary}, {counts['clean']} clean, {skipped} cached, {counts['error']} errors")
+    if counts['needs-fix'] or counts['too-long'] or counts['error']:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()